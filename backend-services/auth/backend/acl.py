@@ -0,0 +1,330 @@
+"""Compiled access control lists"""
+import hashlib
+import json
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+# pylint: disable=relative-beyond-top-level
+from .utils import SEPARATOR, SINGLE, ALL
+
+PATTERN_SEPARATOR = ","
+REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+# Constructs whose meaning changes when a pattern is embedded in a larger
+# alternation (group references, named groups and inline flags)
+NOT_COMBINABLE = re.compile(r"\\[0-9]|\(\?")
+
+
+class PatternMatcher:  # pylint: disable=too-few-public-methods
+    """Matches a string against a comma separated list of regular expressions
+
+    A string matches if `re.match` succeeds for any of the patterns. Literal
+    patterns are looked up as prefixes in hash sets grouped by length, the
+    remaining patterns are combined into a single alternation so that a
+    string is scanned once, however long the list is.
+
+    Args:
+        patterns (str): Comma separated regular expressions
+    """
+
+    __slots__ = ("_prefixes", "_matchers")
+
+    def __init__(self, patterns: str):
+        prefixes = {}
+        combinable = []
+        self._matchers: List[Callable] = []
+
+        for pattern in patterns.split(PATTERN_SEPARATOR):
+            if REGEX_METACHARACTERS.isdisjoint(pattern):
+                prefixes.setdefault(len(pattern), set()).add(pattern)
+            elif NOT_COMBINABLE.search(pattern):
+                self._matchers.append(re.compile(pattern).match)
+            else:
+                combinable.append(pattern)
+
+        self._prefixes = tuple(
+            (length, frozenset(values)) for length, values in sorted(prefixes.items())
+        )
+
+        if combinable:
+            alternation = "|".join(f"(?:{pattern})" for pattern in combinable)
+            self._matchers.insert(0, re.compile(alternation).match)
+
+    def match(self, string: str) -> bool:
+        """Evaluate if a string matches any of the patterns
+
+        Args:
+            string (str): The string to be matched
+
+        Returns:
+            bool: Match or no match
+        """
+        for length, prefixes in self._prefixes:
+            if string[:length] in prefixes:
+                return True
+        for matcher in self._matchers:
+            if matcher(string) is not None:
+                return True
+        return False
+
+
+class PathACL:  # pylint: disable=too-few-public-methods
+    """Path access control from a whitelist and a blacklist
+
+    Args:
+        whitelist (str, optional): Comma separated regular expressions of
+            which one must match the path. No restriction if empty.
+        blacklist (str, optional): Comma separated regular expressions of
+            which none may match the path. No restriction if empty.
+    """
+
+    __slots__ = ("_whitelist", "_blacklist")
+
+    def __init__(self, whitelist: Optional[str], blacklist: Optional[str]):
+        self._whitelist = PatternMatcher(whitelist) if whitelist else None
+        self._blacklist = PatternMatcher(blacklist) if blacklist else None
+
+    def allows(self, path: str) -> bool:
+        """Evaluate if access to a path is allowed
+
+        Args:
+            path (str): The requested path
+
+        Returns:
+            bool: Allowed or not
+        """
+        if self._whitelist is not None and not self._whitelist.match(path):
+            return False
+        if self._blacklist is not None and self._blacklist.match(path):
+            return False
+        return True
+
+
+class TopicNode:  # pylint: disable=too-few-public-methods
+    """A level in a TopicFilterTrie"""
+
+    __slots__ = ("children", "single", "end", "all", "reaches_all")
+
+    def __init__(self):
+        self.children: Dict[str, "TopicNode"] = {}
+        self.single: Optional["TopicNode"] = None
+        self.end = False  # A filter ends at this level
+        self.all = False  # A filter ends with a '#' wildcard at this level
+        self.reaches_all = False  # self.all or single.reaches_all
+
+    def finalize(self):
+        """Compute `reaches_all` for this node and its descendants"""
+        for child in self.children.values():
+            child.finalize()
+        if self.single is not None:
+            self.single.finalize()
+        self.reaches_all = self.all or (
+            self.single is not None and self.single.reaches_all
+        )
+
+
+class TopicFilterTrie:  # pylint: disable=too-few-public-methods
+    """Matches a topic against a comma separated list of MQTT topic filters
+
+    The filters are merged into a trie with one node per level, so that a
+    topic is matched in a single walk over its levels instead of once per
+    filter. The semantics are exactly those of `utils.mqtt_match`, a '#'
+    wildcard matches the parent level and a filter with a '#' wildcard
+    anywhere but at the end never matches.
+
+    Args:
+        patterns (str): Comma separated topic filters
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self, patterns: str):
+        self._root = TopicNode()
+
+        for pattern in patterns.split(PATTERN_SEPARATOR):
+            levels = pattern.split(SEPARATOR)
+            node = self._root
+            for index, level in enumerate(levels):
+                if level == ALL:
+                    if index == len(levels) - 1:
+                        node.all = True
+                    break
+                if level == SINGLE:
+                    if node.single is None:
+                        node.single = TopicNode()
+                    node = node.single
+                else:
+                    node = node.children.setdefault(level, TopicNode())
+            else:
+                node.end = True
+
+        self._root.finalize()
+
+    def match(self, topic: str) -> bool:
+        """Evaluate if a topic matches any of the filters
+
+        Args:
+            topic (str): The topic to be matched
+
+        Returns:
+            bool: Match or no match
+        """
+        nodes = [self._root]
+        for level in topic.split(SEPARATOR):
+            next_nodes = []
+            for node in nodes:
+                if node.all:
+                    return True
+                child = node.children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+                if node.single is not None:
+                    next_nodes.append(node.single)
+            if not next_nodes:
+                return False
+            nodes = next_nodes
+
+        # All levels consumed, the filter must end here or continue with
+        # '+' wildcards up to a final '#' wildcard
+        for node in nodes:
+            if node.end or node.reaches_all:
+                return True
+        return False
+
+
+class TopicACL:  # pylint: disable=too-few-public-methods
+    """MQTT topic access control from a whitelist and a blacklist
+
+    Args:
+        whitelist (str, optional): Comma separated topic filters of which one
+            must match the topic. No restriction if empty.
+        blacklist (str, optional): Comma separated topic filters of which none
+            may match the topic. No restriction if empty.
+    """
+
+    __slots__ = ("_whitelist", "_blacklist")
+
+    def __init__(self, whitelist: Optional[str], blacklist: Optional[str]):
+        self._whitelist = TopicFilterTrie(whitelist) if whitelist else None
+        self._blacklist = TopicFilterTrie(blacklist) if blacklist else None
+
+    def allows(self, topic: str) -> bool:
+        """Evaluate if access to a topic is allowed
+
+        Args:
+            topic (str): The topic
+
+        Returns:
+            bool: Allowed or not
+        """
+        if self._whitelist is not None and not self._whitelist.match(topic):
+            return False
+        if self._blacklist is not None and self._blacklist.match(topic):
+            return False
+        return True
+
+
+@lru_cache(maxsize=1024)
+def compile_path_acl(whitelist: Optional[str], blacklist: Optional[str]) -> PathACL:
+    """Get the compiled PathACL for a whitelist and a blacklist
+
+    Compiled ACLs are cached by the content of the lists, so a user's ACL is
+    only rebuilt after the user's lists have been modified.
+
+    Args:
+        whitelist (str, optional): Comma separated regular expressions
+        blacklist (str, optional): Comma separated regular expressions
+
+    Returns:
+        PathACL: The compiled ACL
+    """
+    return PathACL(whitelist, blacklist)
+
+
+@lru_cache(maxsize=1024)
+def compile_topic_acl(whitelist: Optional[str], blacklist: Optional[str]) -> TopicACL:
+    """Get the compiled TopicACL for a whitelist and a blacklist
+
+    Compiled ACLs are cached by the content of the lists, see
+    `compile_path_acl`.
+
+    Args:
+        whitelist (str, optional): Comma separated topic filters
+        blacklist (str, optional): Comma separated topic filters
+
+    Returns:
+        TopicACL: The compiled ACL
+    """
+    return TopicACL(whitelist, blacklist)
+
+
+class UserACL(NamedTuple):
+    """The access control fields of a user, which can be carried by the ACL
+    claim of a token"""
+
+    admin: bool
+    path_whitelist: Optional[str]
+    path_blacklist: Optional[str]
+    topic_whitelist: Optional[str]
+    topic_blacklist: Optional[str]
+
+    @classmethod
+    def of(cls, user) -> "UserACL":
+        """Get the ACL of a user
+
+        Args:
+            user (User): The user
+
+        Returns:
+            UserACL: The user's ACL
+        """
+        return cls(
+            bool(user.admin),
+            user.path_whitelist,
+            user.path_blacklist,
+            user.topic_whitelist,
+            user.topic_blacklist,
+        )
+
+    @classmethod
+    def from_claim(cls, claim: dict) -> "UserACL":
+        """Get the ACL from the ACL claim of a token, see `claim`
+
+        Args:
+            claim (dict): The ACL claim
+
+        Returns:
+            UserACL: The ACL
+        """
+        return cls(
+            bool(claim.get("a")),
+            claim.get("pw"),
+            claim.get("pb"),
+            claim.get("tw"),
+            claim.get("tb"),
+        )
+
+    @property
+    def version(self) -> str:
+        """A digest of the ACL, which changes whenever any of its fields does"""
+        data = json.dumps(self, separators=(",", ":")).encode()
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+    def claim(self) -> dict:
+        """Get the compact ACL claim of a token, with the version and the
+        fields that are set
+
+        Returns:
+            dict: The ACL claim
+        """
+        claim = {"v": self.version, "a": self.admin}
+        for key, value in (
+            ("pw", self.path_whitelist),
+            ("pb", self.path_blacklist),
+            ("tw", self.topic_whitelist),
+            ("tb", self.topic_blacklist),
+        ):
+            if value is not None:
+                claim[key] = value
+        return claim
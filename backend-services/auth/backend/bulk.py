@@ -0,0 +1,112 @@
+"""Streaming readers and writers for bulk import and export of users"""
+import csv
+import io
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Tuple
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Split a stream of byte chunks into numbered lines of text
+
+    Args:
+        chunks (AsyncIterable[bytes]): The byte chunks, e.g. `request.stream()`
+
+    Yields:
+        Tuple[int, str]: Line number (starting at 1) and line without newline
+    """
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield number + 1, buffer.decode("utf-8").rstrip("\r")
+
+
+async def read_ndjson(
+    chunks: AsyncIterable[bytes],
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Read newline delimited JSON objects from a stream
+
+    Args:
+        chunks (AsyncIterable[bytes]): The byte chunks
+
+    Raises:
+        ValueError: If a line is not a JSON object
+
+    Yields:
+        Tuple[int, Dict[str, Any]]: Line number and object, blank lines are
+            skipped
+    """
+    async for number, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as exc:
+            raise ValueError(f"Line {number}: {exc}") from exc
+        if not isinstance(item, dict):
+            raise ValueError(f"Line {number}: Expected a JSON object")
+        yield number, item
+
+
+async def read_csv(
+    chunks: AsyncIterable[bytes],
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Read rows of a CSV file with a header line from a stream
+
+    Quoted fields may not span several lines. Empty fields are read as None.
+
+    Args:
+        chunks (AsyncIterable[bytes]): The byte chunks
+
+    Raises:
+        ValueError: If a row does not have as many fields as the header
+
+    Yields:
+        Tuple[int, Dict[str, Any]]: Line number and row, blank lines are
+            skipped
+    """
+    header = None
+    async for number, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        fields = next(csv.reader([line]), [])
+        if header is None:
+            header = fields
+            continue
+        if len(fields) != len(header):
+            raise ValueError(f"Line {number}: Expected {len(header)} fields")
+        yield number, {key: value or None for key, value in zip(header, fields)}
+
+
+def write_ndjson(rows: Iterable[Dict[str, Any]]) -> str:
+    """Format rows as newline delimited JSON
+
+    Args:
+        rows (Iterable[Dict[str, Any]]): The rows
+
+    Returns:
+        str: One JSON object per line
+    """
+    return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+
+
+def write_csv(rows: Iterable[Iterable[Any]]) -> str:
+    """Format rows as CSV lines
+
+    Args:
+        rows (Iterable[Iterable[Any]]): The rows, as sequences of values
+
+    Returns:
+        str: One CSV line per row
+    """
+    output = io.StringIO()
+    csv.writer(output, lineterminator="\n").writerows(rows)
+    return output.getvalue()
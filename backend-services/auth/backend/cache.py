@@ -0,0 +1,147 @@
+"""In-process caches"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """A bounded mapping whose entries expire after a time-to-live and which
+    evicts the least recently used entry when full
+
+    Lookups, updates and evictions take no lock: the caches are shared by the
+    requests on the event loop, and no method awaits between reading an entry
+    and moving or replacing it, which also keeps the hit and miss counters
+    exact.
+
+    Args:
+        maxsize (int): Maximum number of entries
+        ttl (float): Default time-to-live of an entry, in seconds
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Incremented whenever entries are removed, see `set`
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value from the cache
+
+        Args:
+            key (Hashable): The key
+            default (Any, optional): Returned on a miss. Defaults to None.
+
+        Returns:
+            Any: The cached value or `default`
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        deadline, value = entry
+        if deadline <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        version: Optional[int] = None,
+    ):
+        """Insert or replace a value in the cache
+
+        Args:
+            key (Hashable): The key
+            value (Any): The value
+            ttl (float, optional): Time-to-live in seconds for this entry.
+                Defaults to the ttl of the cache.
+            version (int, optional): The `version` of the cache when the
+                value was read from its source. If entries have been popped
+                or cleared since, the value may be outdated and is not
+                inserted.
+        """
+        if self.maxsize <= 0 or (version is not None and version != self.version):
+            return
+        if ttl is None:
+            ttl = self.ttl
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry from the cache
+
+        Args:
+            key (Hashable): The key
+            default (Any, optional): Returned if absent. Defaults to None.
+
+        Returns:
+            Any: The removed value or `default`
+        """
+        self.version += 1
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def pop_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Remove the entries whose values match a predicate, in time linear
+        in the size of the cache
+
+        Args:
+            predicate (Callable[[Any], bool]): Tells whether a value is removed
+
+        Returns:
+            int: The number of removed entries
+        """
+        self.version += 1
+        keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        self.version += 1
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters describing the cache usage
+
+        Returns:
+            Dict[str, int]: Size, capacity, hits, misses, evictions and
+                expirations
+        """
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
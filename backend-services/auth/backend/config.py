@@ -0,0 +1,70 @@
+"""Configuration of the auth service, read from environment variables"""
+import logging
+import os
+
+from environs import Env
+
+# pylint: disable=relative-beyond-top-level
+from .keys import SYMMETRIC_ALGORITHMS, ASYMMETRIC_ALGORITHMS
+
+env = Env()
+
+ACCESS_COOKIE_DOMAIN = env("ACCESS_COOKIE_DOMAIN")
+ACCESS_COOKIE_NAME = env("ACCESS_COOKIE_NAME", "crowsnest-auth-access")
+ACCESS_COOKIE_SECURE = env.bool("ACCESS_COOKIE_SECURE", False)
+ACCESS_COOKIE_HTTPONLY = env.bool("ACCESS_COOKIE_HTTPONLY", True)
+ACCESS_COOKIE_SAMESITE = env(
+    "ACCESS_COOKIE_SAMESITE", "lax", validate=lambda s: s in ["lax", "strict", "none"]
+)
+ACCESS_TOKEN_EXPIRE_MINUTES = env.int("ACCESS_TOKEN_EXPIRE_MINUTES", 30)
+
+JWT_ALGORITHM = env(
+    "JWT_ALGORITHM",
+    "HS256",
+    validate=lambda s: s in SYMMETRIC_ALGORITHMS + ASYMMETRIC_ALGORITHMS,
+)
+JWT_TOKEN_SECRET = env("JWT_TOKEN_SECRET", None)
+JWT_SIGNING_KEY_FILES = env.list("JWT_SIGNING_KEY_FILES", [])
+JWKS_MAX_AGE = env.int("JWKS_MAX_AGE", 300)
+
+USER_DATABASE_URL = env("USER_DATABASE_URL")
+DATABASE_POOL_MIN_SIZE = env.int("DATABASE_POOL_MIN_SIZE", 10)
+DATABASE_POOL_MAX_SIZE = env.int("DATABASE_POOL_MAX_SIZE", 10)
+DATABASE_ACQUIRE_TIMEOUT = env.float("DATABASE_ACQUIRE_TIMEOUT", 10)
+DATABASE_STATEMENT_TIMEOUT = env.int("DATABASE_STATEMENT_TIMEOUT", 0)
+ADMIN_USER_USERNAME = env("ADMIN_USERNAME", "admin")
+ADMIN_USER_PASSWORD = env("ADMIN_USER_PASSWORD")
+BASE_URL = env("BASE_URL")
+
+USER_CACHE_SIZE = env.int("USER_CACHE_SIZE", 1024)
+USER_CACHE_TTL = env.float("USER_CACHE_TTL", 30)
+UNKNOWN_USER_CACHE_SIZE = env.int("UNKNOWN_USER_CACHE_SIZE", 4096)
+UNKNOWN_USER_CACHE_TTL = env.float("UNKNOWN_USER_CACHE_TTL", 5)
+TOKEN_CACHE_SIZE = env.int("TOKEN_CACHE_SIZE", 4096)
+TOKEN_CACHE_TTL = env.float("TOKEN_CACHE_TTL", 300)
+USER_COUNT_CACHE_TTL = env.float("USER_COUNT_CACHE_TTL", 0)
+PASSWORD_HASH_WORKERS = env.int("PASSWORD_HASH_WORKERS", 2)
+PASSWORD_HASH_QUEUE_LIMIT = env.int("PASSWORD_HASH_QUEUE_LIMIT", 32)
+IMPORT_BATCH_SIZE = env.int("IMPORT_BATCH_SIZE", 500)
+IMPORT_HASH_WORKERS = env.int("IMPORT_HASH_WORKERS", os.cpu_count() or 1)
+EXPORT_BATCH_SIZE = 500
+USER_CHANGES_CHANNEL = env("USER_CHANGES_CHANNEL", "auth_user_changes")
+USER_CHANGES_LISTEN = env.bool("USER_CHANGES_LISTEN", True)
+STATELESS_VERIFY = env.bool("STATELESS_VERIFY", False)
+ACL_VERSION_CACHE_SIZE = env.int("ACL_VERSION_CACHE_SIZE", 100000)
+REVOCATION_SYNC_INTERVAL = env.float("REVOCATION_SYNC_INTERVAL", 10)
+REVOCATION_FILTER_CAPACITY = env.int("REVOCATION_FILTER_CAPACITY", 10000)
+REVOCATION_FILTER_ERROR_RATE = env.float("REVOCATION_FILTER_ERROR_RATE", 0.01)
+VERIFY_FAST_PATH = env.bool("VERIFY_FAST_PATH", True)
+LOGIN_RATE_PER_USERNAME = env.float("LOGIN_RATE_PER_USERNAME", 0.1)
+LOGIN_BURST_PER_USERNAME = env.int("LOGIN_BURST_PER_USERNAME", 10)
+LOGIN_RATE_PER_CLIENT = env.float("LOGIN_RATE_PER_CLIENT", 1)
+LOGIN_BURST_PER_CLIENT = env.int("LOGIN_BURST_PER_CLIENT", 30)
+LOGIN_RATE_LIMIT_SIZE = env.int("LOGIN_RATE_LIMIT_SIZE", 100000)
+LOGIN_CONCURRENCY_LIMIT = env.int("LOGIN_CONCURRENCY_LIMIT", 16)
+TRUSTED_PROXY_COUNT = env.int("TRUSTED_PROXY_COUNT", 1)
+PROFILER_ENABLED = env.bool("PROFILER_ENABLED", False)
+AUTH_LOG_LEVEL = env.log_level("AUTH_LOG_LEVEL", logging.INFO)
+AUTH_LOG_RATE = env.float("AUTH_LOG_RATE", 1)
+AUTH_LOG_BURST = env.int("AUTH_LOG_BURST", 10)
+AUTH_LOG_QUEUE_SIZE = env.int("AUTH_LOG_QUEUE_SIZE", 1000)
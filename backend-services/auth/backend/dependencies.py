@@ -0,0 +1,497 @@
+"""State shared by the routes of the auth service, and the lookups of tokens
+and users they depend on"""
+import logging
+import math
+import secrets
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from pathlib import Path
+
+from fastapi import Depends, HTTPException
+from jose.exceptions import JWTError, ExpiredSignatureError, JWTClaimsError
+from sqlalchemy import select
+
+# pylint: disable=import-error, relative-beyond-top-level, no-name-in-module
+from . import schemas
+from . import models
+from .oauth2_password_bearer_cookie import OAuth2PasswordBearerOrCookie
+from .cache import TTLCache
+from .acl import UserACL
+from .passwords import PasswordHasher
+from .pool import MonitoredDatabase, PoolMonitor
+from .notify import ChangeListener, install_user_change_triggers
+from .revocation import RevocationList
+from .ratelimit import ConcurrencyLimiter, TokenBucketLimiter
+from .logs import DecisionLog
+from .profiling import Profiler, observe_phase
+from .keys import KeyRing
+from .metrics import EXPIRED_TOKENS, INVALID_CLAIMS, INVALID_TOKENS, REVOKED_TOKENS
+from .exceptions import OverloadedException, RevokedTokenError
+from .config import (
+    ACCESS_COOKIE_NAME,
+    ACL_VERSION_CACHE_SIZE,
+    AUTH_LOG_BURST,
+    AUTH_LOG_LEVEL,
+    AUTH_LOG_QUEUE_SIZE,
+    AUTH_LOG_RATE,
+    DATABASE_ACQUIRE_TIMEOUT,
+    DATABASE_POOL_MAX_SIZE,
+    DATABASE_POOL_MIN_SIZE,
+    DATABASE_STATEMENT_TIMEOUT,
+    JWT_ALGORITHM,
+    JWT_SIGNING_KEY_FILES,
+    JWT_TOKEN_SECRET,
+    LOGIN_BURST_PER_CLIENT,
+    LOGIN_BURST_PER_USERNAME,
+    LOGIN_CONCURRENCY_LIMIT,
+    LOGIN_RATE_LIMIT_SIZE,
+    LOGIN_RATE_PER_CLIENT,
+    LOGIN_RATE_PER_USERNAME,
+    PASSWORD_HASH_QUEUE_LIMIT,
+    PASSWORD_HASH_WORKERS,
+    REVOCATION_FILTER_CAPACITY,
+    REVOCATION_FILTER_ERROR_RATE,
+    REVOCATION_SYNC_INTERVAL,
+    STATELESS_VERIFY,
+    TOKEN_CACHE_SIZE,
+    TOKEN_CACHE_TTL,
+    UNKNOWN_USER_CACHE_SIZE,
+    UNKNOWN_USER_CACHE_TTL,
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL,
+    USER_CHANGES_CHANNEL,
+    USER_COUNT_CACHE_TTL,
+    USER_DATABASE_URL,
+)
+
+key_ring = KeyRing(
+    JWT_ALGORITHM,
+    secret=JWT_TOKEN_SECRET,
+    private_keys=[
+        Path(path).read_text(encoding="ascii") for path in JWT_SIGNING_KEY_FILES
+    ],
+)
+
+oauth2_scheme = OAuth2PasswordBearerOrCookie(
+    tokenUrl="login", cookie_name=ACCESS_COOKIE_NAME
+)
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS, queue_limit=PASSWORD_HASH_QUEUE_LIMIT
+)
+
+decision_log = DecisionLog(
+    f"{__name__}.decisions",
+    level=AUTH_LOG_LEVEL,
+    rate=AUTH_LOG_RATE,
+    burst=AUTH_LOG_BURST,
+    queue_size=AUTH_LOG_QUEUE_SIZE,
+)
+
+# Logins are limited before any database or bcrypt work is done
+username_login_limiter = TokenBucketLimiter(
+    LOGIN_RATE_PER_USERNAME, LOGIN_BURST_PER_USERNAME, LOGIN_RATE_LIMIT_SIZE
+)
+client_login_limiter = TokenBucketLimiter(
+    LOGIN_RATE_PER_CLIENT, LOGIN_BURST_PER_CLIENT, LOGIN_RATE_LIMIT_SIZE
+)
+login_concurrency_limiter = ConcurrencyLimiter(LOGIN_CONCURRENCY_LIMIT)
+
+database = MonitoredDatabase(
+    USER_DATABASE_URL,
+    min_size=DATABASE_POOL_MIN_SIZE,
+    max_size=DATABASE_POOL_MAX_SIZE,
+    server_settings={"statement_timeout": str(DATABASE_STATEMENT_TIMEOUT)},
+)
+pool_monitor = PoolMonitor(acquire_timeout=DATABASE_ACQUIRE_TIMEOUT or None)
+revocation_list = RevocationList(
+    database,
+    capacity=REVOCATION_FILTER_CAPACITY,
+    error_rate=REVOCATION_FILTER_ERROR_RATE,
+    sync_interval=REVOCATION_SYNC_INTERVAL,
+)
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# Usernames without a user, so that unknown usernames are not queried over
+# and over. Entries are evicted when users are added.
+unknown_user_cache = TTLCache(
+    maxsize=UNKNOWN_USER_CACHE_SIZE, ttl=UNKNOWN_USER_CACHE_TTL
+)
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+user_count_cache = TTLCache(maxsize=64, ttl=USER_COUNT_CACHE_TTL)
+
+# Current ACL versions by username, for stateless verification. Entries do
+# not expire, they are evicted when users change.
+acl_version_cache = TTLCache(maxsize=ACL_VERSION_CACHE_SIZE, ttl=math.inf)
+
+# Requests are only profiled on demand, see `routers.profiling`
+profiler = Profiler()
+
+
+def evict_user(username: Optional[str]):
+    """Drop a changed user, and the cached claims of its tokens, from the
+    in-process caches
+
+    Args:
+        username (str, optional): The changed user, or None if users were
+            only added
+    """
+    if username is not None:
+        user_cache.pop(username)
+        unknown_user_cache.pop(username)
+        acl_version_cache.pop(username)
+        token_cache.pop_where(lambda claims: claims.get("sub") == username)
+    else:
+        unknown_user_cache.clear()
+    user_count_cache.clear()
+
+
+def evict_all_users():
+    """Drop all users, and the cached claims of tokens, from the in-process
+    caches"""
+    user_cache.clear()
+    unknown_user_cache.clear()
+    token_cache.clear()
+    acl_version_cache.clear()
+    user_count_cache.clear()
+
+
+change_listener = ChangeListener(
+    USER_DATABASE_URL,
+    USER_CHANGES_CHANNEL,
+    on_change=evict_user,
+    on_reset=evict_all_users,
+)
+
+
+def user_changed(username: Optional[str]):
+    """Evict a user changed by this replica from its caches right away,
+    rather than once the change notification of the database arrives
+
+    Args:
+        username (str, optional): The changed user, or None if users were
+            only added
+    """
+    evict_user(username)
+
+
+async def publish_user_changes():
+    """Have the database notify the replicas of every change of a user, see
+    `notify.install_user_change_triggers`"""
+    await install_user_change_triggers(
+        database, models.users.name, USER_CHANGES_CHANNEL
+    )
+
+
+USER_OUT_FIELDS = tuple(schemas.UserOut.__fields__)
+USER_LIST_COLUMNS = [models.users.c[name] for name in USER_OUT_FIELDS]
+
+
+# Token and user lookup
+
+
+async def decode_token(token: str) -> dict:
+    """Decode and verify a JWT, served from the token cache when possible
+
+    Only tokens that passed verification are cached, keyed by the complete
+    token string, and each entry is dropped no later than the token's `exp`.
+    On a miss the signature is verified by python-jose, which compares HMAC
+    digests in constant time, with the key of the key ring the token names.
+    Cached or not, the token ID is checked against the revocation list,
+    which takes a filter probe unless it was revoked.
+
+    Args:
+        token (str): The encoded JWT
+
+    Raises:
+        RevokedTokenError: If the token has been revoked
+        JWTError: If the token is invalid, see `jose.jwt.decode`
+
+    Returns:
+        dict: The verified claims, which must not be modified
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        start = time.perf_counter()
+        try:
+            claims = key_ring.decode(token)
+        except ExpiredSignatureError:
+            EXPIRED_TOKENS.inc()
+            decision_log.log(logging.INFO, "expired_token")
+            raise
+        except JWTClaimsError as exc:
+            INVALID_CLAIMS.inc()
+            decision_log.log(logging.WARNING, "invalid_claims", error=str(exc))
+            raise
+        except JWTError as exc:
+            INVALID_TOKENS.inc()
+            decision_log.log(logging.WARNING, "invalid_token", error=str(exc))
+            raise
+        finally:
+            observe_phase("jwt", time.perf_counter() - start)
+        ttl = token_cache.ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            ttl = min(ttl, claims["exp"] - time.time())
+        token_cache.set(token, claims, ttl=ttl)
+
+    jti = claims.get("jti")
+    if jti is not None and revocation_list.might_be_revoked(jti):
+        if await revocation_list.is_revoked(jti, claims.get("exp")):
+            token_cache.pop(token)
+            REVOKED_TOKENS.inc()
+            decision_log.log(logging.INFO, "revoked_token", sub=claims.get("sub"))
+            raise RevokedTokenError("Revoked token")
+    return claims
+
+
+async def fetch_user(username: str) -> models.UserSnapshot:
+    """Fetch a User by username, served from the in-process user cache when
+    possible
+
+    Usernames without a user are remembered for UNKNOWN_USER_CACHE_TTL
+    seconds, or until users are added, and not queried again meanwhile.
+
+    Args:
+        username (str): The username
+
+    Returns:
+        UserSnapshot: The user or None if there is no such user
+    """
+    user = user_cache.get(username)
+    if user is None:
+        if unknown_user_cache.get(username):
+            return None
+        # A user changed while the query is in flight must not be cached
+        version = user_cache.version
+        unknown_version = unknown_user_cache.version
+        query = models.users.select().where(models.User.username == username)
+        record = await database.fetch_one(query)
+        if record:
+            user = models.UserSnapshot.from_record(record)
+            user_cache.set(username, user, version=version)
+        else:
+            unknown_user_cache.set(username, True, version=unknown_version)
+    return user
+
+
+async def fetch_user_acl(claims: dict) -> Optional[UserACL]:
+    """Get the ACL of the user of a verified token
+
+    In stateless verify mode, the ACL claim of the token is used if its
+    version is the current version of the user's ACL. Current versions are
+    loaded at startup, evicted when users change and otherwise known from
+    earlier lookups, so this needs no database access for tokens issued
+    since the user's last change. Other tokens fall back to fetching the
+    user.
+
+    Args:
+        claims (dict): The verified claims
+
+    Returns:
+        UserACL: The user's ACL or None if there is no such user
+    """
+    username = claims.get("sub")
+    claim = claims.get("acl")
+    if STATELESS_VERIFY and claim is not None:
+        if acl_version_cache.get(username) == claim.get("v"):
+            return UserACL.from_claim(claim)
+
+    version = acl_version_cache.version
+    user = await fetch_user(username)
+    if user is None:
+        return None
+    user_acl = UserACL.of(user)
+    if STATELESS_VERIFY:
+        acl_version_cache.set(username, user_acl.version, version=version)
+    return user_acl
+
+
+async def load_acl_versions():
+    """Load the current ACL versions of all users, for stateless verification"""
+    version = acl_version_cache.version
+    query = select(
+        [models.users.c.username] + [models.users.c[name] for name in UserACL._fields]
+    )
+    for record in await database.fetch_all(query):
+        acl_version_cache.set(
+            record["username"],
+            UserACL(*(record[name] for name in UserACL._fields)).version,
+            version=version,
+        )
+
+
+# Dependencies
+
+
+async def get_claims_from_bearer_token(
+    token_tuple: Tuple[str, str] = Depends(oauth2_scheme)
+) -> Tuple[dict, str]:
+    """Get claims from bearer token"""
+    _, token = token_tuple
+    claims = None
+    if token is None:
+        message = "Login necessary"
+    else:
+        try:
+            claims = await decode_token(token)
+            message = ""
+        except ExpiredSignatureError:
+            message = "Expired session"
+        except RevokedTokenError:
+            message = "Revoked session"
+        except JWTClaimsError:
+            message = "Invalid claims"
+        except JWTError:
+            message = "Invalid token"
+    return claims, message
+
+
+# pylint: disable=broad-except
+async def get_user_from_bearer_token(
+    claims_tuple: Tuple[dict, str] = Depends(get_claims_from_bearer_token),
+) -> Tuple[models.UserSnapshot, str]:
+    """Get the user from bearer token"""
+    claims, message = claims_tuple
+    user = None
+    if claims is not None:
+        try:
+            user = await fetch_user(claims["sub"])
+        except OverloadedException:
+            raise
+        except Exception:
+            pass
+    return user, message
+
+
+async def get_acl_from_bearer_token(
+    claims_tuple: Tuple[dict, str] = Depends(get_claims_from_bearer_token),
+) -> Tuple[UserACL, str]:
+    """Get the user's ACL from bearer token, see `fetch_user_acl`"""
+    claims, message = claims_tuple
+    user_acl = None
+    if claims is not None:
+        try:
+            user_acl = await fetch_user_acl(claims)
+        except OverloadedException:
+            raise
+        except Exception:
+            pass
+    return user_acl, message
+
+
+# pylint: enable=broad-except
+
+
+async def verify_token(
+    user_tuple: Tuple[models.UserSnapshot, str] = Depends(get_user_from_bearer_token)
+) -> models.UserSnapshot:
+    """Verify that the client provides a valid token and get its user"""
+    user, message = user_tuple
+    if not user:
+        raise HTTPException(status_code=401, detail=message)
+    return user
+
+
+async def verify_token_admin(
+    user_tuple: Tuple[models.UserSnapshot, str] = Depends(get_user_from_bearer_token)
+):
+    """Verify that the client provides a valid token and that the corresponding
+    user is an administrator"""
+    user, message = user_tuple
+    if not user:
+        raise HTTPException(status_code=401, detail=message)
+    if not user.admin:
+        raise HTTPException(status_code=401, detail="Unauthorized access")
+
+
+## JWT utility functions ##
+
+
+def create_jwt_token(user: models.User, exp: timedelta = None) -> str:
+    """Create a JSON Web Token (JWT) string from a User instance, with an
+    ACL claim in stateless verify mode
+
+    Args:
+        user (User): The User instance,
+        exp (timedelta, optional): Validity time in seconds. Defaults to None.
+
+    Returns:
+        str: A JSON Web Token
+    """
+
+    claims = {
+        "sub": str(user.username),
+        "iat": (now := datetime.utcnow()),
+        "jti": secrets.token_urlsafe(16),
+    }
+
+    if exp:
+        claims.update({"exp": now + exp})
+
+    if STATELESS_VERIFY:
+        claims["acl"] = UserACL.of(user).claim()
+
+    start = time.perf_counter()
+    try:
+        return key_ring.encode(claims)
+    finally:
+        observe_phase("jwt", time.perf_counter() - start)
+
+
+async def get_credentials(
+    token_tuple: Tuple[str, str] = Depends(oauth2_scheme)
+) -> Dict:
+    """Get credentials"""
+
+    # pylint: disable=raise-missing-from
+    token_type, token = token_tuple
+
+    if not token:
+        return {
+            "valid": False,
+            "message": "Login necessary" if token_type == "cookie" else "Missing token",
+            "claims": {},
+            "token_type": token_type,
+            "token": "",
+        }
+
+    try:
+        claims = await decode_token(token)
+        message = ""
+        valid = True
+    except ExpiredSignatureError:
+        claims = {}
+        message = "Expired session"
+        valid = False
+    except JWTClaimsError:
+        claims = {}
+        message = "Invalid claims"
+        valid = False
+    except JWTError:
+        message = "Invalid token"
+        claims = {}
+        valid = False
+
+    return {
+        "valid": valid,
+        "message": message,
+        "claims": claims,
+        "token_type": token_type,
+        "token": token,
+    }
+
+
+async def get_user_from_claims(claims: Dict) -> models.UserSnapshot:
+    """Fetch the User from the user database using the information provided in
+    the decoded claims from a JWT token
+
+    Args:
+        claims (Dict): The claims as decoded from a JWT token
+
+    Returns:
+        UserSnapshot: The user
+    """
+    username = claims.get("username")
+    query = models.users.select().where(models.User.username == username)
+    return models.UserSnapshot.from_record(await database.fetch_one(query))
@@ -1,6 +1,7 @@
 """
 Exceptions
 """
+from jose.exceptions import JWTError
 
 
 class VerifyException(Exception):
@@ -9,3 +10,20 @@ class VerifyException(Exception):
     def __init__(self, message: str):
         # super().__init__()
         self.message = message
+
+
+class OverloadedException(Exception):
+    """Raised when a request is rejected to protect the service from overload"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class RateLimitedException(OverloadedException):
+    """Raised when a client or user exceeds its rate limit"""
+
+
+class RevokedTokenError(JWTError):
+    """Raised when a token has been revoked"""
@@ -0,0 +1,130 @@
+"""Keys signing and verifying the access tokens"""
+import base64
+import hashlib
+import json
+from typing import Dict, List, Optional, Sequence
+
+from jose import jwk, jwt
+from jose.exceptions import JWKError, JWTError
+
+SYMMETRIC_ALGORITHMS = ("HS256",)
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+# Required members of a public JWK by key type, see RFC 7638
+THUMBPRINT_MEMBERS = {"RSA": ("e", "kty", "n"), "EC": ("crv", "kty", "x", "y")}
+
+
+def thumbprint(public_jwk: Dict[str, str]) -> str:
+    """Compute the RFC 7638 thumbprint of a public JWK, used as its key ID
+
+    Args:
+        public_jwk (Dict[str, str]): The public JWK
+
+    Returns:
+        str: The base64url encoded SHA-256 thumbprint
+    """
+    members = {name: public_jwk[name] for name in THUMBPRINT_MEMBERS[public_jwk["kty"]]}
+    data = json.dumps(members, separators=(",", ":"), sort_keys=True).encode()
+    digest = hashlib.sha256(data).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+class KeyRing:
+    """Signs tokens with the current key and verifies them with any key of
+    the ring
+
+    With HS256 tokens are signed and verified with a shared secret. With
+    RS256 or ES256 they are signed with the first of the private keys and
+    carry its key ID (`kid`) in their header. Tokens signed with any of the
+    keys are verified, so that a key can be rotated by putting the new key
+    first and removing the old one once its tokens have expired. The public
+    keys are published as a JWK Set for verification by other services.
+
+    Args:
+        algorithm (str): HS256, RS256 or ES256
+        secret (str, optional): The shared secret, for HS256
+        private_keys (Sequence[str]): PEM encoded private keys, for RS256
+            or ES256, the first one signs
+
+    Raises:
+        ValueError: If the algorithm is not supported or its keys are missing
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        secret: Optional[str] = None,
+        private_keys: Sequence[str] = (),
+    ):
+        self.algorithm = algorithm
+        self._public_keys = {}
+        self._public_jwks: List[Dict[str, str]] = []
+
+        if algorithm in SYMMETRIC_ALGORITHMS:
+            if not secret:
+                raise ValueError(f"{algorithm} needs a secret")
+            self._signing_key = secret
+            self._signing_kid = None
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            if not private_keys:
+                raise ValueError(f"{algorithm} needs at least one private key")
+            for index, private_key in enumerate(private_keys):
+                try:
+                    key = jwk.construct(private_key, algorithm)
+                    public_key = key.public_key()
+                    public_jwk = public_key.to_dict()
+                except (JWKError, AttributeError, TypeError, ValueError) as exc:
+                    raise ValueError(f"Key {index} is not a {algorithm} key") from exc
+                if key.is_public():
+                    raise ValueError(f"Key {index} is not a private key")
+                kid = thumbprint(public_jwk)
+                self._public_keys[kid] = public_key
+                self._public_jwks.append(
+                    {**public_jwk, "kid": kid, "use": "sig", "alg": algorithm}
+                )
+            self._signing_key = jwk.construct(private_keys[0], algorithm)
+            self._signing_kid = self._public_jwks[0]["kid"]
+        else:
+            raise ValueError(f"Unsupported algorithm {algorithm}")
+
+    def encode(self, claims: dict) -> str:
+        """Sign claims as a JWT
+
+        Args:
+            claims (dict): The claims
+
+        Returns:
+            str: The encoded JWT
+        """
+        headers = {"kid": self._signing_kid} if self._signing_kid else None
+        return jwt.encode(
+            claims, self._signing_key, algorithm=self.algorithm, headers=headers
+        )
+
+    def decode(self, token: str) -> dict:
+        """Verify and decode a JWT
+
+        Args:
+            token (str): The encoded JWT
+
+        Raises:
+            JWTError: If the token is invalid or signed by an unknown key,
+                see `jose.jwt.decode`
+
+        Returns:
+            dict: The claims
+        """
+        key = self._signing_key
+        if self._public_keys:
+            key = self._public_keys.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise JWTError("Signed by an unknown key")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> Dict[str, List[Dict[str, str]]]:
+        """Get the public keys as a JWK Set, empty for HS256
+
+        Returns:
+            Dict[str, List[Dict[str, str]]]: The JWK Set
+        """
+        return {"keys": list(self._public_jwks)}
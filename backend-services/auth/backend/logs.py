@@ -0,0 +1,137 @@
+"""Structured, rate limited logging of authentication decisions, written by a
+background thread"""
+import json
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# pylint: disable=relative-beyond-top-level
+from .ratelimit import TokenBucketLimiter
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+
+class JSONMessage:  # pylint: disable=too-few-public-methods
+    """A log message of fields, encoded as JSON only when it is written"""
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return json.dumps(self.fields, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Puts records on a bounded queue as they are, dropping them when the
+    queue is full rather than blocking or reporting an error
+
+    Records are formatted by the handlers of the listener, so their
+    arguments must not be modified after logging.
+    """
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DecisionLog:
+    """Logs authentication decisions as JSON objects through a queue, written
+    to the handler by a background thread
+
+    Each kind of event is rate limited by a token bucket, so that a storm of,
+    say, expired tokens is logged at a bounded rate. The number of events
+    suppressed since the last logged one is added to it. The time spent
+    logging on the calling thread is counted.
+
+    Args:
+        name (str): Name of the logger
+        level (int): Minimum level of the logged events
+        rate (float): Events per second logged per kind in the long run
+        burst (int): Events logged per kind at once
+        queue_size (int): Maximum number of events waiting to be written
+        handler (logging.Handler, optional): Writes the events. Defaults to
+            a handler writing to stderr.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name: str,
+        level: int,
+        rate: float,
+        burst: int,
+        queue_size: int,
+        handler: Optional[logging.Handler] = None,
+    ):
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(level)
+        self.limiter = TokenBucketLimiter(rate, burst, maxsize=64)
+        if handler is None:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        self._handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self._listener = QueueListener(self._handler.queue, handler)
+        self._suppressed: Dict[str, int] = {}
+        self.logged = 0
+        self.seconds = 0.0
+
+    def start(self):
+        """Start writing events in the background"""
+        self.logger.addHandler(self._handler)
+        self.logger.propagate = False
+        self._listener.start()
+
+    def stop(self):
+        """Write the queued events and stop"""
+        self._listener.stop()
+        self.logger.removeHandler(self._handler)
+        self.logger.propagate = True
+
+    def log(self, level: int, event: str, **fields: Any):
+        """Log an event, unless its kind exceeds the rate limit
+
+        Args:
+            level (int): The level, e.g. `logging.INFO`
+            event (str): The kind of event, e.g. `expired_token`
+            **fields (Any): Details of the event
+        """
+        start = time.perf_counter()
+        try:
+            if not self.logger.isEnabledFor(level):
+                return
+            if self.limiter.acquire(event):
+                self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                return
+            suppressed = self._suppressed.pop(event, 0)
+            if suppressed:
+                fields["suppressed"] = suppressed
+            self.logger.log(level, "%s", JSONMessage({"event": event, **fields}))
+            self.logged += 1
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def stats(self) -> Dict[str, float]:
+        """Statistics of the log
+
+        Returns:
+            Dict[str, float]: Events logged, suppressed by the rate limits and
+                dropped because the queue was full, events waiting in the
+                queue and seconds spent logging on the calling thread
+        """
+        return {
+            "logged": self.logged,
+            "suppressed": self.limiter.rejections,
+            "dropped": self._handler.dropped,
+            "queued": self._handler.queue.qsize(),
+            "seconds": self.seconds,
+        }
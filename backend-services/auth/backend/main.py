@@ -1,64 +1,82 @@
 """Crow's Nest Auth microservice"""
 
+import functools
+import hashlib
 import logging
-from typing import Dict, Tuple, List
+import math
+from typing import Dict, Tuple, List, Optional
 from datetime import datetime, timedelta
-import re
-from urllib import parse
 
-from fastapi import FastAPI, Depends, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, Header, Request, HTTPException
+from fastapi.responses import Response
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from jose import jwt
-from jose.exceptions import JWTError, ExpiredSignatureError, JWTClaimsError
-from passlib.context import CryptContext
-from environs import Env
-from databases import Database
-from sqlalchemy import create_engine, text
-from starlette.responses import RedirectResponse
+from sqlalchemy import create_engine, func, select, tuple_
 
 # pylint: disable=import-error, relative-beyond-top-level, no-name-in-module
 from . import schemas
 from . import models
-from .oauth2_password_bearer_cookie import OAuth2PasswordBearerOrCookie
-from .utils import mqtt_match
-
-# from .utils import mqtt_match
-from .exceptions import VerifyException
-
-LOGGER = logging.getLogger(__name__)
-
-# Reading config from environment variables
-env = Env()
-
-ACCESS_COOKIE_DOMAIN = env("ACCESS_COOKIE_DOMAIN")
-ACCESS_COOKIE_NAME = env("ACCESS_COOKIE_NAME", "crowsnest-auth-access")
-ACCESS_COOKIE_SECURE = env.bool("ACCESS_COOKIE_SECURE", False)
-ACCESS_COOKIE_HTTPONLY = env.bool("ACCESS_COOKIE_HTTPONLY", True)
-ACCESS_COOKIE_SAMESITE = env(
-    "ACCESS_COOKIE_SAMESITE", "lax", validate=lambda s: s in ["lax", "strict", "none"]
+from .utils import encode_cursor, decode_cursor, validate_paths_text_string
+from .acl import UserACL
+from .responses import FastJSONResponse, etag_matches, record_dict
+from .profiling import ProfilerMiddleware
+from .metrics import MetricsMiddleware
+from .exceptions import VerifyException, OverloadedException, RateLimitedException
+from .config import (
+    ACCESS_COOKIE_DOMAIN,
+    ACCESS_COOKIE_HTTPONLY,
+    ACCESS_COOKIE_NAME,
+    ACCESS_COOKIE_SAMESITE,
+    ACCESS_COOKIE_SECURE,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ADMIN_USER_PASSWORD,
+    ADMIN_USER_USERNAME,
+    BASE_URL,
+    JWKS_MAX_AGE,
+    PROFILER_ENABLED,
+    STATELESS_VERIFY,
+    TRUSTED_PROXY_COUNT,
+    USER_CACHE_SIZE,
+    USER_CHANGES_LISTEN,
+    USER_DATABASE_URL,
 )
-ACCESS_TOKEN_EXPIRE_MINUTES = env.int("ACCESS_TOKEN_EXPIRE_MINUTES", 30)
-
-JWT_TOKEN_SECRET = env("JWT_TOKEN_SECRET")
-
-USER_DATABASE_URL = env("USER_DATABASE_URL")
-ADMIN_USER_USERNAME = env("ADMIN_USERNAME", "admin")
-ADMIN_USER_PASSWORD = env("ADMIN_USER_PASSWORD")
-BASE_URL = env("BASE_URL")
-
-# Setting up app and other context
-app = FastAPI(root_path=BASE_URL)
-
-oauth2_scheme = OAuth2PasswordBearerOrCookie(
-    tokenUrl="login", cookie_name=ACCESS_COOKIE_NAME
+from .dependencies import (
+    USER_LIST_COLUMNS,
+    USER_OUT_FIELDS,
+    acl_version_cache,
+    change_listener,
+    client_login_limiter,
+    create_jwt_token,
+    database,
+    decision_log,
+    get_claims_from_bearer_token,
+    key_ring,
+    load_acl_versions,
+    login_concurrency_limiter,
+    oauth2_scheme,
+    password_hasher,
+    pool_monitor,
+    profiler,
+    publish_user_changes,
+    revocation_list,
+    token_cache,
+    user_changed,
+    user_count_cache,
+    username_login_limiter,
+    verify_token,
+    verify_token_admin,
 )
+from .routers import bulk, metrics, profiling, verify
+from .routers.verify import verify_exception_response
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Setting up app and other context
+app = FastAPI(root_path=BASE_URL, default_response_class=FastJSONResponse)
 
-database = Database(USER_DATABASE_URL)
+app.add_middleware(MetricsMiddleware, routes=lambda: app.routes)
 
+# Requests are only profiled on demand, see `routers.profiling`
+if PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware, profiler=profiler, routes=lambda: app.routes)
 
 # Allows CORS if localhost
 if ACCESS_COOKIE_DOMAIN == "localhost":
@@ -68,9 +86,14 @@ if ACCESS_COOKIE_DOMAIN == "localhost":
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["x-total-count"],
+        expose_headers=["x-total-count", "x-next-cursor"],
     )
 
+# Included ahead of the routes below, so that `/users/export` is not taken
+# for a user by `/users/{idx}`
+for router in (verify.router, metrics.router, profiling.router, bulk.router):
+    app.include_router(router)
+
 
 # Exception Handlers
 
@@ -78,85 +101,39 @@ if ACCESS_COOKIE_DOMAIN == "localhost":
 @app.exception_handler(VerifyException)
 async def redirect_or_exception_handler(request: Request, exc: VerifyException):
     """Handle redirect or exception"""
-    uri = request.headers.get("X-Forwarded-Uri", "")
-    host = request.headers.get("X-Forwarded-Host", "")
-
-    if "/api/" in uri:
-        raise HTTPException(status_code=401, detail=exc.message)
-
-    redirect_url = (
-        "http://"
-        + host
-        + "/auth?url="
-        + parse.quote("http://" + host + uri)
-        + "&message="
-        + parse.quote(exc.message)
-    )
-    return RedirectResponse(redirect_url)
-
+    return verify_exception_response(request, exc)
 
-# Dependencies
 
-
-async def get_claims_from_bearer_token(
-    token_tuple: Tuple[str, str] = Depends(oauth2_scheme)
-) -> Tuple[dict, str]:
-    """Get claims from bearer token"""
-    _, token = token_tuple
-    claims = None
-    if token is None:
-        message = "Login necessary"
-    else:
-        try:
-            claims = jwt.decode(token, JWT_TOKEN_SECRET, algorithms=["HS256"])
-            message = ""
-        except ExpiredSignatureError:
-            message = "Expired session"
-        except JWTClaimsError:
-            message = "Invalid claims"
-        except JWTError:
-            message = "Invalid token"
-    return claims, message
-
-
-# pylint: disable=broad-except
-async def get_user_from_bearer_token(
-    claims_tuple: Tuple[models.User, str] = Depends(get_claims_from_bearer_token),
-) -> Tuple[models.User, str]:
-    """Get User instance from bearer token"""
-    claims, message = claims_tuple
-    user = None
-    if claims is not None:
-        try:
-            query = models.users.select().where(models.User.username == claims["sub"])
-            user = models.User.from_record(await database.fetch_one(query))
-        except Exception:
-            pass
-    return user, message
-
-
-# pylint: enable=broad-except
+@app.exception_handler(OverloadedException)
+async def overloaded_exception_handler(_: Request, exc: OverloadedException):
+    """Handle rejections due to overload"""
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": exc.message},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
-async def verify_token(
-    user_tuple: Tuple[models.User, str] = Depends(get_user_from_bearer_token)
-):
-    """Verify that the client provides a valid token"""
-    user, message = user_tuple
-    if not user:
-        raise HTTPException(status_code=401, detail=message)
+@app.exception_handler(RateLimitedException)
+async def rate_limited_exception_handler(_: Request, exc: RateLimitedException):
+    """Handle rejections due to rate limits"""
+    return FastJSONResponse(
+        status_code=429,
+        content={"detail": exc.message},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
-async def verify_token_admin(
-    user_tuple: Tuple[models.User, str] = Depends(get_user_from_bearer_token)
-):
-    """Verify that the client provides a valid token and that the corresponding
-    user is an administrator"""
-    user, message = user_tuple
-    if not user:
-        raise HTTPException(status_code=401, detail=message)
-    if not user.admin:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+# Columns the users listing can be sorted by and paginated with keyset cursors
+USER_SORT_COLUMNS = ("id", "username", "firstname", "lastname", "email", "admin")
+# Nullable columns the listing can only be paginated by offset when sorted by,
+# as rows with NULL never compare greater or less than a cursor
+USER_OFFSET_SORT_COLUMNS = (
+    "path_whitelist",
+    "path_blacklist",
+    "topic_whitelist",
+    "topic_blacklist",
+)
 
 
 @app.on_event("startup")
@@ -166,14 +143,26 @@ async def startup():
     # Database initial setup using sqlalchemy
     models.Base.metadata.create_all(create_engine(USER_DATABASE_URL))
 
+    password_hasher.start()
+    bulk.import_password_hasher.start()
+
     # Connect with actual connection we will use from here on forwards
     await database.connect()
+    pool_monitor.instrument(database)
+    await publish_user_changes()
+    if USER_CHANGES_LISTEN:
+        change_listener.start()
+    if STATELESS_VERIFY:
+        await load_acl_versions()
+    await revocation_list.sync()
+    revocation_list.start()
+    decision_log.start()
 
     # Create admin user
     query = models.users.select().where(models.User.username == ADMIN_USER_USERNAME)
     admin_user: models.User = await database.fetch_one(query)
 
-    hashed_password = pwd_context.hash(ADMIN_USER_PASSWORD)
+    hashed_password = await password_hasher.hash(ADMIN_USER_PASSWORD)
     if admin_user:
         query = (
             models.users.update()
@@ -196,115 +185,155 @@ async def startup():
 @app.on_event("shutdown")
 async def shutdown():
     """Run during shutdown of this application"""
+    await change_listener.stop()
+    await revocation_list.stop()
+    decision_log.stop()
     await database.disconnect()
+    password_hasher.shutdown()
+    bulk.import_password_hasher.shutdown()
 
 
-## JWT utility functions ##
+@functools.lru_cache(maxsize=USER_CACHE_SIZE)
+def user_etag(user: models.UserSnapshot) -> str:
+    """Get the ETag of the public details of a user, a digest of them that is
+    the same on every replica
 
+    Args:
+        user (UserSnapshot): The user
+
+    Returns:
+        str: The quoted ETag
+    """
+    values = repr(tuple(getattr(user, name) for name in USER_OUT_FIELDS))
+    return f'"{hashlib.blake2b(values.encode(), digest_size=8).hexdigest()}"'
 
-def create_jwt_token(user: models.User, exp: timedelta = None) -> str:
-    """Create a JSON Web Token (JWT) string from a User instance
+
+def user_out_response(
+    user: models.UserSnapshot, if_none_match: Optional[str] = None
+) -> Response:
+    """Respond with the public details of a user, as in `schemas.UserOut`,
+    and their ETag
+
+    The snapshot is encoded directly rather than being validated against the
+    response model of the route, which only documents the response. If the
+    client already has the current details, as told by its `If-None-Match`
+    header, nothing is encoded and 304 Not Modified is returned.
 
     Args:
-        user (User): The User instance,
-        exp (timedelta, optional): Validity time in seconds. Defaults to None.
+        user (UserSnapshot): The user
+        if_none_match (str, optional): The `If-None-Match` header
 
     Returns:
-        str: A JSON Web Token
+        Response: The response
     """
+    headers = {"ETag": user_etag(user), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(
+        {name: getattr(user, name) for name in USER_OUT_FIELDS}, headers=headers
+    )
 
-    claims = {
-        "sub": str(user.username),
-        "iat": (now := datetime.utcnow()),
-    }
 
-    if exp:
-        claims.update({"exp": now + exp})
+# *** Routes ****
 
-    return jwt.encode(claims, JWT_TOKEN_SECRET, algorithm="HS256")
 
+def client_address(request: Request) -> str:
+    """Get the address of the client of a request
 
-async def get_credentials(
-    token_tuple: Tuple[str, str] = Depends(oauth2_scheme)
-) -> Dict:
-    """Get credentials"""
+    Behind `TRUSTED_PROXY_COUNT` reverse proxies, the client is the address
+    that the outermost proxy appended to `X-Forwarded-For`. Addresses before
+    it were sent by the client and cannot be trusted.
 
-    # pylint: disable=raise-missing-from
-    token_type, token = token_tuple
+    Args:
+        request (Request): The request
 
-    if not token:
-        return {
-            "valid": False,
-            "message": "Login necessary" if token_type == "cookie" else "Missing token",
-            "claims": {},
-            "token_type": token_type,
-            "token": "",
-        }
+    Returns:
+        str: The client address
+    """
+    if TRUSTED_PROXY_COUNT > 0:
+        forwarded_for = request.headers.get("X-Forwarded-For")
+        if forwarded_for:
+            addresses = forwarded_for.split(",")
+            return addresses[max(len(addresses) - TRUSTED_PROXY_COUNT, 0)].strip()
+    return request.client.host if request.client else ""
 
-    try:
-        claims = jwt.decode(token, JWT_TOKEN_SECRET, algorithms=["HS256"])
-        message = ""
-        valid = True
-    except ExpiredSignatureError:
-        claims = {}
-        message = "Expired session"
-        LOGGER.exception(message)
-        valid = False
-    except JWTClaimsError:
-        claims = {}
-        message = "Invalid claims"
-        LOGGER.exception(message)
-        valid = False
-    except JWTError:
-        message = "Invalid token"
-        LOGGER.exception(message)
-        claims = {}
-        valid = False
-
-    return {
-        "valid": valid,
-        "message": message,
-        "claims": claims,
-        "token_type": token_type,
-        "token": token,
-    }
 
+def limit_login_rate(client: str, username: str):
+    """Take a login attempt from the rate limit of the client, if neither
+    the client nor the username exceeds its limit
 
-async def get_user_from_claims(claims: Dict) -> models.User:
-    """Fetch the User from the user database using the information provided in
-    the decoded claims from a JWT token
+    The username limit only counts failed attempts, see
+    `count_failed_login`, so that a user logging in successfully does not
+    use up the attempts of the username.
 
     Args:
-        claims (Dict): The claims as decoded from a JWT token
+        client (str): The client address
+        username (str): The username logged in to
 
-    Returns:
-        User: A user instance
+    Raises:
+        RateLimitedException: If the client or username exceeds its limit
     """
-    username = claims.get("username")
-    query = models.users.select().where(models.User.username == username)
-    return models.User.from_record(await database.fetch_one(query))
+    retry_after = max(
+        client_login_limiter.check(client),
+        username_login_limiter.check(username.lower()),
+    )
+    if retry_after:
+        decision_log.log(
+            logging.WARNING, "login_rate_limited", username=username, client=client
+        )
+        raise RateLimitedException(
+            "Too many login attempts", retry_after=math.ceil(retry_after)
+        )
+    client_login_limiter.acquire(client)
 
 
-# *** Routes ****
+def count_failed_login(username: str):
+    """Take a failed login attempt from the rate limit of the username
+
+    Args:
+        username (str): The username logged in to
+    """
+    username_login_limiter.acquire(username.lower())
 
 
 @app.post("/login", response_model=schemas.Response)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    """Login a user"""
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    """Login a user
+
+    Attempts are rate limited per client and username and the number of
+    logins in progress is limited, so that rejections are answered before
+    any database or bcrypt work."""
 
     username: str = form_data.username
     password: str = form_data.password
 
-    # Query database
-    query = models.users.select().where(models.User.username == username)
-    record = await database.fetch_one(query)
-    if not record:
-        raise HTTPException(status_code=401, detail="Wrong username or password.")
-    user = models.User.from_record(record)
+    client = client_address(request)
 
-    # Compare credentials
-    if not pwd_context.verify(password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Wrong username or password.")
+    limit_login_rate(client, username)
+    with login_concurrency_limiter.slot():
+        # Query database
+        query = models.users.select().where(models.User.username == username)
+        record = await database.fetch_one(query)
+        if not record:
+            count_failed_login(username)
+            decision_log.log(
+                logging.WARNING, "unknown_user", username=username, client=client
+            )
+            raise HTTPException(status_code=401, detail="Wrong username or password.")
+        user = models.UserSnapshot.from_record(record)
+
+        # Compare credentials
+        if not await password_hasher.verify(password, user.hashed_password):
+            count_failed_login(username)
+            decision_log.log(
+                logging.WARNING, "wrong_password", username=username, client=client
+            )
+            raise HTTPException(status_code=401, detail="Wrong username or password.")
+
+    decision_log.log(logging.INFO, "login", username=username, client=client)
+
+    if STATELESS_VERIFY:
+        acl_version_cache.set(user.username, UserACL.of(user).version)
 
     # Create token
     jwt_token: str = create_jwt_token(
@@ -312,7 +341,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     )
 
     # Create response with cookie
-    response = JSONResponse(status_code=200, content={"success": True})
+    response = FastJSONResponse(status_code=200, content={"success": True})
 
     # Cookie domain should not be used with localhost
     access_cookie_domain = (
@@ -335,140 +364,142 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 @app.post(
     "/logout", dependencies=[Depends(verify_token)], response_model=schemas.Response
 )
-async def logout():
-    """Logout user"""
-    response = JSONResponse(status_code=200, content={"success": True})
+async def logout(
+    token_tuple: Tuple[str, str] = Depends(oauth2_scheme),
+    claims_tuple: Tuple[dict, str] = Depends(get_claims_from_bearer_token),
+):
+    """Logout user, revoking the token"""
+    _, token = token_tuple
+    claims, _ = claims_tuple
+    if "jti" in claims:
+        exp = claims.get("exp")
+        await revocation_list.revoke(
+            claims["jti"], datetime.utcfromtimestamp(exp) if exp else None
+        )
+    token_cache.pop(token)
+
+    response = FastJSONResponse(status_code=200, content={"success": True})
     response.delete_cookie(ACCESS_COOKIE_NAME)
     return response
 
 
-@app.get(
-    "/me",
-    response_model=schemas.UserOut,
-    dependencies=[Depends(verify_token)],
-)
+@app.get("/me", response_model=schemas.UserOut)
 async def get_me(
-    user_tuple: Tuple[models.User, str] = Depends(get_user_from_bearer_token)
+    user: models.UserSnapshot = Depends(verify_token),
+    if_none_match: Optional[str] = Header(None),
 ):
-    """Get the details of the current user"""
-    user, _ = user_tuple
-    return user
-
-
-def validate_paths_text_string(text_string: str) -> bool:
-    """Validate that a text string containing pahts"""
-    if len(text_string) == 0:
-        return True
-    paths = text_string.split(",")
-    for path in paths:
-        if not re.match(r"/[a-z0-9/]+", path):
-            return False
-    return True
+    """Get the details of the current user, or 304 Not Modified if they match
+    the ETag of `If-None-Match`"""
+    return user_out_response(user, if_none_match)
+
+
+@app.get("/.well-known/jwks.json")
+async def get_jwks():
+    """Get the public keys verifying the access tokens as a JWK Set, which is
+    empty unless tokens are signed with RS256 or ES256"""
+    return FastJSONResponse(
+        key_ring.jwks(),
+        headers={"Cache-Control": f"public, max-age={JWKS_MAX_AGE}"},
+    )
 
 
-@app.get("/verify", response_model=schemas.Response)
-async def verify_request(
-    request: Request, user_tuple: Tuple[dict, str] = Depends(get_user_from_bearer_token)
+@app.get(
+    "/users",
+    response_model=List[schemas.UserOut],
+    dependencies=[Depends(verify_token_admin)],
+)
+async def get_all_users(  # pylint: disable=too-many-arguments
+    _start: int = 0,
+    _end: int = None,
+    _sort: str = "id",
+    _order: str = "ASC",
+    _cursor: str = None,
+    firstname: str = None,
+    lastname: str = None,
+    email: str = None,
 ):
-    """Verify that the user has the permissions for the request"""
-
-    uri = request.headers.get("X-Forwarded-Uri")
-    host = request.headers.get("X-Forwarded-Host")
-
-    if not host or not uri:
-        msg = "Missing required X-Forwarded-Headers provided by Traefik"
-        raise HTTPException(400, msg)
-
-    # Get user
-    user, message = user_tuple
-    if not user:
-        raise VerifyException(message)
-
-    # Limit access to non-administrators
-    if "admin" in uri and not user.admin:
-        raise VerifyException("Unauthorized access")
-
-    # Access Control List checks
-    if user.path_whitelist:
-        accepted = False
-        for path in user.path_whitelist.split(","):
-            if re.match(path, uri):
-                accepted = True
-        if not accepted:
-            raise VerifyException(f"Unauthorized access to {uri}")
-
-    if user.path_blacklist:
-        accepted = True
-        for path in user.path_blacklist.split(","):
-            if re.match(path, uri):
-                accepted = False
-
-        if not accepted:
-            raise VerifyException(f"Unauthorized access to {uri}")
+    """Get JSON Response with a page of users in the database and headers
+    containing the total count and a cursor to the next page.
+
+    Pages are selected either by offset (`_start`) or, more efficiently for
+    deep pages, by passing the `x-next-cursor` of the previous page as
+    `_cursor`. The page size is `_end - _start`. Listings sorted by an ACL
+    column have no cursors and are paginated by offset only."""
+    keyset = _sort in USER_SORT_COLUMNS
+    if not keyset and _sort not in USER_OFFSET_SORT_COLUMNS:
+        raise HTTPException(status_code=422, detail=f"Cannot sort by {_sort}")
+    if _order.upper() not in ("ASC", "DESC"):
+        raise HTTPException(status_code=422, detail=f"Invalid order {_order}")
+
+    filter_values = {
+        name: value
+        for name, value in (
+            ("firstname", firstname),
+            ("lastname", lastname),
+            ("email", email),
+        )
+        if value is not None
+    }
+    filters = [models.users.c[name] == value for name, value in filter_values.items()]
 
-    return JSONResponse(status_code=200, content={"success": True})
+    sort_key = (models.users.c[_sort], models.users.c.id)
+    descending = _order.upper() == "DESC"
+    query = (
+        select(USER_LIST_COLUMNS)
+        .where(*filters)
+        .order_by(*(c.desc() if descending else c.asc() for c in sort_key))
+    )
 
+    if _cursor is not None:
+        if not keyset:
+            raise HTTPException(
+                status_code=422, detail=f"Cannot paginate by cursor sorted by {_sort}"
+            )
+        try:
+            after = tuple_(
+                *decode_cursor(_cursor, [c.type.python_type for c in sort_key])
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        query = query.where(
+            tuple_(*sort_key) < after if descending else tuple_(*sort_key) > after
+        )
+    elif _start:
+        query = query.offset(_start)
 
-@app.get("/verify_emqx")
-async def verify_emqx(
-    username: str,
-    topic: str,
-):
-    """Authenticate and authorize a request according to EMQX HTTP ACL plugin"""
+    limit = None if _end is None else max(_end - _start, 0)
+    if limit is not None:
+        query = query.limit(limit)
 
-    query = models.users.select().where(models.User.username == username)
-    record = await database.fetch_one(query)
+    user_records = [record_dict(user) for user in await database.fetch_all(query)]
 
-    if not record:
-        # Check if the username is a JWT token, if so, retrieve username
+    response = FastJSONResponse(user_records)
+    response.headers["x-total-count"] = str(await count_users(filter_values))
+    if keyset and limit and len(user_records) == limit:
+        last = user_records[-1]
+        response.headers["x-next-cursor"] = encode_cursor([last[_sort], last["id"]])
+    return response
 
-        claims = jwt.decode(username, JWT_TOKEN_SECRET, algorithms=["HS256"])
-        if "sub" not in claims:
-            raise HTTPException(401, "Unauthorized")
-        query = models.users.select().where(models.User.username == claims["sub"])
-        record = await database.fetch_one(query)
-        if not record:
-            raise HTTPException(401, "Unauthorized")
-
-    user = models.User.from_record(record)
-
-    # ACL checks
-    if patterns := user.topic_whitelist:
-        accepted = False
-        for pattern in patterns.split(","):
-            if mqtt_match(pattern, topic):
-                accepted = True
-        if not accepted:
-            raise HTTPException(403, f"Access is not allowed to {topic}")
-    if patterns := user.topic_blacklist:
-        accepted = True
-        for pattern in patterns.split(","):
-            if mqtt_match(pattern, topic):
-                accepted = False
-        if not accepted:
-            raise HTTPException(403, f"Access is not allowed to {topic}")
-    # Accepted!
-    return JSONResponse("Authorized")
 
+async def count_users(filter_values: Dict[str, str]) -> int:
+    """Count the users with the given column values, cached for
+    USER_COUNT_CACHE_TTL seconds
 
-@app.get(
-    "/users",
-    response_model=List[schemas.UserOut],
-    dependencies=[Depends(verify_token_admin)],
-)
-async def get_all_users(_end: int, _order: str, _sort: str, _start: int):
-    """Get JSON Response with a list of all users in the database and
-    a header continaing the total count."""
-    query = (
-        models.users.select().order_by(text(f"{_sort} {_order}")).slice(_start, _end)
-    )
-    user_records = [dict(user) for user in await database.fetch_all(query)]
+    Args:
+        filter_values (Dict[str, str]): Column names and values to filter on
 
-    response = JSONResponse(user_records)
-    response.headers["x-total-count"] = str(
-        len(await database.fetch_all(models.users.select()))
-    )
-    return response
+    Returns:
+        int: The number of users
+    """
+    key = tuple(sorted(filter_values.items()))
+    count = user_count_cache.get(key)
+    if count is None:
+        query = select([func.count()]).select_from(models.users)
+        for name, value in filter_values.items():
+            query = query.where(models.users.c[name] == value)
+        count = await database.fetch_val(query)
+        user_count_cache.set(key, count)
+    return count
 
 
 @app.get(
@@ -476,14 +507,16 @@ async def get_all_users(_end: int, _order: str, _sort: str, _start: int):
     response_model=schemas.UserOut,
     dependencies=[Depends(verify_token_admin)],
 )
-async def get_user_by_id(idx: int):
-    """Get user by its Id"""
+async def get_user_by_id(idx: int, if_none_match: Optional[str] = Header(None)):
+    """Get user by its Id, or 304 Not Modified if it matches the ETag of
+    `If-None-Match`"""
     try:
-        return models.User.from_record(
+        user = models.UserSnapshot.from_record(
             await database.fetch_one(models.users.select().where(models.User.id == idx))
         )
     except Exception as exc:
         raise HTTPException(status_code=406, detail=str(exc)) from exc
+    return user_out_response(user, if_none_match)
 
 
 @app.post(
@@ -492,7 +525,7 @@ async def get_user_by_id(idx: int):
 )
 async def create_user(user: schemas.CreateUser):
     """Create user"""
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
 
     try:
         await database.execute(
@@ -509,12 +542,13 @@ async def create_user(user: schemas.CreateUser):
                 topic_blacklist=user.topic_blacklist,
             )
         )
-        return JSONResponse(status_code=200, content={"success": True})
     except Exception as exc:
         raise HTTPException(
             status_code=406,
             detail=f"User with username '{user.username.lower()}' already exists",
         ) from exc
+    user_changed(user.username.lower())
+    return FastJSONResponse(status_code=200, content={"success": True})
 
 
 @app.put(
@@ -527,7 +561,7 @@ async def modify_user(idx: int, modifications: schemas.ModifyUser):
     mods = {k: v for k, v in modifications.__dict__.items() if v is not None}
     # If provided, hash the password
     if "password" in mods:
-        mods["hashed_password"] = pwd_context.hash(modifications.password)
+        mods["hashed_password"] = await password_hasher.hash(modifications.password)
         del mods["password"]
 
     # Validate the paths_text_string
@@ -554,9 +588,11 @@ async def modify_user(idx: int, modifications: schemas.ModifyUser):
         ) from exc
 
     # Success
-    return models.User.from_record(
+    user = models.UserSnapshot.from_record(
         await database.fetch_one(models.users.select().where(models.User.id == idx))
     )
+    user_changed(user.username)
+    return user_out_response(user)
 
 
 @app.delete(
@@ -569,12 +605,13 @@ async def modify_user(idx: int, modifications: schemas.ModifyUser):
 async def delete_user(idx: int):
     """Delete user"""
     try:
-        models.User.from_record(
+        user = models.UserSnapshot.from_record(
             await database.fetch_one(models.users.select().where(models.User.id == idx))
         )
         await database.execute(models.users.delete().where(models.User.id == idx))
-        return JSONResponse(status_code=200, content={"detail": "success"})
     except Exception as exc:
         raise HTTPException(
             status_code=406, detail=f"User with id '{idx}' does not exist"
         ) from exc
+    user_changed(user.username)
+    return FastJSONResponse(status_code=200, content={"detail": "success"})
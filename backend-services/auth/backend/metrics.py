@@ -0,0 +1,166 @@
+"""Prometheus metrics"""
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_SECONDS = Histogram(
+    "auth_request_duration_seconds",
+    "Time spent handling a request",
+    ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "auth_request_database_queries",
+    "Number of database queries made while handling a request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 25),
+)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "auth_request_database_duration_seconds",
+    "Time spent on database queries while handling a request",
+    ["route"],
+    buckets=(0, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+PASSWORD_SECONDS = Histogram(
+    "auth_password_duration_seconds",
+    "Time spent hashing or verifying a password with bcrypt",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1, 2),
+)
+TOKEN_FAILURES = Counter(
+    "auth_token_failures",
+    "Tokens that failed verification, by reason",
+    ["reason"],
+)
+ACL_DECISIONS = Counter(
+    "auth_acl_decisions",
+    "Access control decisions, by type of ACL",
+    ["acl", "decision"],
+)
+
+# Label children are resolved once, so that observing a value on the hot
+# path is a dictionary lookup and a counter update
+PASSWORD_HASH_SECONDS = PASSWORD_SECONDS.labels("hash")
+PASSWORD_VERIFY_SECONDS = PASSWORD_SECONDS.labels("verify")
+EXPIRED_TOKENS = TOKEN_FAILURES.labels("expired")
+INVALID_CLAIMS = TOKEN_FAILURES.labels("invalid_claims")
+INVALID_TOKENS = TOKEN_FAILURES.labels("invalid_token")
+REVOKED_TOKENS = TOKEN_FAILURES.labels("revoked")
+_ACL_DECISIONS = {
+    (acl, allowed): ACL_DECISIONS.labels(acl, "allow" if allowed else "deny")
+    for acl in ("admin", "path", "topic")
+    for allowed in (True, False)
+}
+
+# Number and duration of the database queries of the current request
+_request_queries: ContextVar[Optional[list]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def count_acl_decision(acl: str, allowed: bool):
+    """Count an access control decision
+
+    Args:
+        acl (str): The type of ACL, 'admin', 'path' or 'topic'
+        allowed (bool): The decision
+    """
+    _ACL_DECISIONS[acl, allowed].inc()
+
+
+def observe_query(seconds: float):
+    """Record a database query made while handling the current request
+
+    Args:
+        seconds (float): Duration of the query
+    """
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+        queries[1] += seconds
+
+
+class MetricsMiddleware:  # pylint: disable=too-few-public-methods
+    """ASGI middleware observing the latency and the database usage of every
+    HTTP request, labelled by the path of the matched route
+
+    Args:
+        app (ASGIApp): The wrapped application
+        routes (Callable): Returns the routes of the application, as objects
+            with `endpoint` and `path` attributes
+    """
+
+    def __init__(self, app: ASGIApp, routes: Callable):
+        self.app = app
+        self._routes = routes
+        self._children: Dict[Callable, tuple] = {}
+        self._unmatched = self._labels(UNMATCHED_ROUTE)
+
+    @staticmethod
+    def _labels(route: str) -> tuple:
+        return (
+            REQUEST_SECONDS.labels(route),
+            DB_QUERIES_PER_REQUEST.labels(route),
+            DB_SECONDS_PER_REQUEST.labels(route),
+        )
+
+    def _children_for(self, endpoint: Optional[Callable]) -> tuple:
+        if endpoint is None:
+            return self._unmatched
+        children = self._children.get(endpoint)
+        if children is None:
+            # Resolved once per route, the first time it is requested
+            for route in self._routes():
+                if getattr(route, "endpoint", None) is endpoint:
+                    children = self._labels(route.path)
+                    self._children[endpoint] = children
+                    break
+            else:
+                children = self._unmatched
+        return children
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            request_seconds, query_count, query_seconds = self._children_for(
+                scope.get("endpoint")
+            )
+            request_seconds.observe(elapsed)
+            query_count.observe(queries[0])
+            query_seconds.observe(queries[1])
+
+
+class StatsCollector:  # pylint: disable=too-few-public-methods
+    """Prometheus collector exposing nested statistics dictionaries, such as
+    those of the caches and the database pool, as gauges
+
+    Args:
+        stats (Callable): Returns a dictionary of dictionaries of numbers
+    """
+
+    def __init__(self, stats: Callable[[], Dict[str, Dict[str, float]]]):
+        self._stats = stats
+
+    def collect(self):
+        """Collect the statistics, called by prometheus_client"""
+        for group, values in self._stats().items():
+            for name, value in values.items():
+                yield GaugeMetricFamily(
+                    f"auth_{group}_{name}", f"{name} of {group}", value=value
+                )
@@ -1,9 +1,14 @@
 """SQLAlchemy ORM models"""
+from collections import namedtuple
+from typing import Mapping
 
-from sqlalchemy import Column, BigInteger, String, Boolean
+from sqlalchemy import Column, BigInteger, String, Boolean, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from databases.backends.postgres import Record
 
+# pylint: disable=relative-beyond-top-level
+from .acl import UserACL
+
 Base = declarative_base()
 
 
@@ -43,3 +48,52 @@ class User(Base):  # pylint: disable=missing-class-docstring,too-few-public-meth
 
 
 users = User.__table__
+
+# The columns of the users table, in order
+USER_FIELDS = (
+    "id",
+    "username",
+    "firstname",
+    "lastname",
+    "email",
+    *UserACL._fields,
+    "hashed_password",
+    "token",
+)
+
+
+class UserSnapshot(
+    namedtuple("UserSnapshot", USER_FIELDS)
+):  # pylint: disable=too-few-public-methods
+    """An immutable snapshot of a row of the users table, for read paths
+
+    Much cheaper to create than a `User`, whose instances are instrumented by
+    SQLAlchemy, and safe to share through caches. `User` remains the model of
+    the table and is used to build rows for writes. The access control
+    fields are those of `acl.UserACL`.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_record(cls, record: Mapping) -> "UserSnapshot":
+        """Create a snapshot from a record of all columns of the users table
+
+        Args:
+            record (Mapping): The record, e.g. an asyncpg record
+
+        Returns:
+            UserSnapshot: The snapshot
+        """
+        return cls._make([record[name] for name in cls._fields])
+
+
+class RevokedToken(
+    Base
+):  # pylint: disable=missing-class-docstring,too-few-public-methods
+    __tablename__ = "revoked_tokens"
+    jti = Column(String(64), primary_key=True)
+    expires = Column(DateTime, index=True)
+
+
+revoked_tokens = RevokedToken.__table__
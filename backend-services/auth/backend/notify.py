@@ -0,0 +1,181 @@
+"""Cross-replica cache invalidation with Postgres LISTEN/NOTIFY"""
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Optional
+
+import asyncpg
+from databases import Database
+from sqlalchemy import func, select
+
+# pylint: disable=relative-beyond-top-level
+from .tasks import BackgroundTask
+
+LOGGER = logging.getLogger(__name__)
+
+
+# Publishes the changes of the users table, whichever client makes them, on
+# the channel given as trigger argument. Inserts only add users, truncating
+# the table resets the caches.
+PUBLISH_USER_CHANGE_FUNCTION = """
+CREATE OR REPLACE FUNCTION publish_user_change() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify(TG_ARGV[0], json_build_object('username', NULL)::text);
+        ELSIF TG_OP = 'TRUNCATE' THEN
+            PERFORM pg_notify(TG_ARGV[0], json_build_object('reset', true)::text);
+        ELSE
+            PERFORM pg_notify(
+                TG_ARGV[0], json_build_object('username', OLD.username)::text
+            );
+            IF TG_OP = 'UPDATE' AND NEW.username IS DISTINCT FROM OLD.username THEN
+                PERFORM pg_notify(
+                    TG_ARGV[0], json_build_object('username', NEW.username)::text
+                );
+            END IF;
+        END IF;
+        RETURN NULL;
+    END
+$$
+"""
+
+USER_CHANGE_TRIGGERS = (
+    ("publish_user_insert", "INSERT", "STATEMENT"),
+    ("publish_user_update", "UPDATE OR DELETE", "ROW"),
+    ("publish_user_truncate", "TRUNCATE", "STATEMENT"),
+)
+
+
+async def install_user_change_triggers(database: Database, table: str, channel: str):
+    """Create or replace the triggers notifying the listeners on a channel of
+    every change of the users table
+
+    The notifications are delivered once the changing transaction commits,
+    to every connection listening on the channel, including those of other
+    replicas. Changes made with plain SQL are published as well.
+
+    Args:
+        database (Database): The user database
+        table (str): Name of the users table
+        channel (str): The notification channel
+    """
+    quoted_channel = "'" + channel.replace("'", "''") + "'"
+    async with database.transaction():
+        # Replicas starting together would otherwise replace the function
+        # concurrently
+        await database.execute(
+            select(
+                [
+                    func.pg_advisory_xact_lock(
+                        func.hashtext(PUBLISH_USER_CHANGE_FUNCTION)
+                    )
+                ]
+            )
+        )
+        await database.execute(PUBLISH_USER_CHANGE_FUNCTION)
+        for name, events, level in USER_CHANGE_TRIGGERS:
+            await database.execute(
+                f"CREATE OR REPLACE TRIGGER {name} AFTER {events} ON {table} "
+                f"FOR EACH {level} EXECUTE FUNCTION "
+                f"publish_user_change({quoted_channel})"
+            )
+
+
+class ChangeListener(BackgroundTask):
+    """Listens for user change notifications on a dedicated connection
+
+    Notifications published while the connection is down are lost, so the
+    caches are reset whenever the connection is (re)established, and when a
+    notification asks for a reset.
+
+    Args:
+        url (str): The database URL
+        channel (str): The notification channel
+        on_change (Callable): Called with the username of each notification,
+            which is None if users were only added
+        on_reset (Callable): Called when changes may have been missed
+        retry_interval (float): Seconds between connection attempts
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        url: str,
+        channel: str,
+        on_change: Callable[[Optional[str]], None],
+        on_reset: Callable[[], None],
+        retry_interval: float = 1.0,
+    ):
+        super().__init__(retry_interval)
+        self.url = url
+        self.channel = channel
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.notifications = 0
+        self.resets = 0
+        self._connection = None
+
+    async def stop(self):
+        """Stop listening and close the connection"""
+        await super().stop()
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def run(self):
+        """Listen, connecting in the background so that an unavailable
+        database does not block startup, and reconnecting when the
+        connection is lost"""
+        while True:
+            closed = asyncio.Event()
+            try:
+                self._connection = await asyncpg.connect(self.url)
+                self._connection.add_termination_listener(lambda _: closed.set())
+                await self._connection.add_listener(self.channel, self._notified)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+                LOGGER.warning("Cannot listen for user changes: %s", exc)
+                if self._connection is not None:
+                    self._connection.terminate()
+                    self._connection = None
+                await asyncio.sleep(self.interval)
+                continue
+            self._reset()
+
+            await closed.wait()
+            LOGGER.warning("Lost the connection listening for user changes")
+            self._connection = None
+
+    def _reset(self):
+        self.resets += 1
+        self.on_reset()
+
+    def _notified(self, _connection, _pid: int, _channel: str, payload: str):
+        self.notifications += 1
+        try:
+            change = json.loads(payload)
+            reset = change.get("reset", False)
+            username = None if reset else change["username"]
+        except (ValueError, TypeError, KeyError, AttributeError):
+            LOGGER.warning("Malformed user change notification %r", payload)
+            self._reset()
+            return
+        if reset:
+            self._reset()
+        else:
+            self.on_change(username)
+
+    def stats(self) -> Dict[str, float]:
+        """Statistics of the listener
+
+        Returns:
+            Dict[str, float]: Whether the listener is connected, the number
+                of notifications received and of cache resets
+        """
+        return {
+            "connected": int(
+                self._connection is not None and not self._connection.is_closed()
+            ),
+            "notifications": self.notifications,
+            "resets": self.resets,
+        }
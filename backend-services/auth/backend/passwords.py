@@ -0,0 +1,104 @@
+"""Password hashing and verification off the event loop"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+# pylint: disable=relative-beyond-top-level
+from .exceptions import OverloadedException
+from .metrics import PASSWORD_HASH_SECONDS, PASSWORD_VERIFY_SECONDS
+from .profiling import observe_phase
+
+
+def timed(func, histogram):
+    """Wrap a function to observe its duration in a histogram"""
+
+    def wrapper(*args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with bcrypt on a bounded thread pool
+
+    bcrypt releases the GIL while hashing, so running it on worker threads
+    keeps the event loop responsive. Calls beyond `queue_limit` outstanding
+    hashes or verifications are rejected instead of queued.
+
+    Args:
+        workers (int): Number of worker threads
+        queue_limit (int): Maximum number of outstanding calls, running or
+            waiting for a worker
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._hash = timed(self.context.hash, PASSWORD_HASH_SECONDS)
+        self._verify = timed(self.context.verify, PASSWORD_VERIFY_SECONDS)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        """Start the worker threads, unless they are running"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password"
+            )
+
+    async def _run(self, func, *args):
+        if self.pending >= self.queue_limit:
+            raise OverloadedException("Too many concurrent password operations")
+        self.pending += 1
+        start = time.perf_counter()
+        self.start()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+        finally:
+            self.pending -= 1
+            observe_phase("bcrypt", time.perf_counter() - start)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password
+
+        Args:
+            password (str): The password in plain text
+
+        Raises:
+            OverloadedException: If too many calls are outstanding
+
+        Returns:
+            str: The hashed password
+        """
+        return await self._run(self._hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password against a hash
+
+        Args:
+            password (str): The password in plain text
+            hashed_password (str): The hashed password
+
+        Raises:
+            OverloadedException: If too many calls are outstanding
+
+        Returns:
+            bool: Match or no match
+        """
+        return await self._run(self._verify, password, hashed_password)
+
+    def shutdown(self):
+        """Stop the worker threads, they are started again by `start`"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,157 @@
+"""Database connection pool monitoring"""
+import asyncio
+import time
+from typing import Any, Dict, List, Mapping, Optional
+
+from databases import Database
+
+# pylint: disable=relative-beyond-top-level
+from .exceptions import OverloadedException
+from .metrics import observe_query
+from .profiling import observe_phase
+
+
+def observe(seconds: float):
+    """Record a database query with `metrics.observe_query` and as the `db`
+    phase of a profiled request"""
+    observe_query(seconds)
+    observe_phase("db", seconds)
+
+
+class MonitoredDatabase(Database):
+    """A Database recording the duration of every query with `observe`"""
+
+    async def fetch_all(self, query, values: dict = None) -> List[Mapping]:
+        start = time.perf_counter()
+        try:
+            return await super().fetch_all(query, values)
+        finally:
+            observe(time.perf_counter() - start)
+
+    async def fetch_one(self, query, values: dict = None) -> Optional[Mapping]:
+        start = time.perf_counter()
+        try:
+            return await super().fetch_one(query, values)
+        finally:
+            observe(time.perf_counter() - start)
+
+    async def fetch_val(self, query, values: dict = None, column: Any = 0) -> Any:
+        start = time.perf_counter()
+        try:
+            return await super().fetch_val(query, values, column)
+        finally:
+            observe(time.perf_counter() - start)
+
+    async def execute(self, query, values: dict = None) -> Any:
+        start = time.perf_counter()
+        try:
+            return await super().execute(query, values)
+        finally:
+            observe(time.perf_counter() - start)
+
+    async def execute_many(self, query, values: list) -> None:
+        start = time.perf_counter()
+        try:
+            return await super().execute_many(query, values)
+        finally:
+            observe(time.perf_counter() - start)
+
+
+class PoolMonitor:
+    """Applies an acquire timeout to the asyncpg pool of a `databases.Database`
+    and records how long connections are waited for
+
+    `databases` acquires a pooled connection for every query, so the
+    acquire wait time shows how close the pool is to its maximum size.
+
+    Args:
+        acquire_timeout (float, optional): Seconds to wait for a connection
+            before giving up, no limit if None
+    """
+
+    def __init__(self, acquire_timeout: Optional[float]):
+        self.acquire_timeout = acquire_timeout
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._pool = None
+
+    def instrument(self, database: Database):
+        """Put a monitoring proxy in front of the pool of a connected database
+
+        Args:
+            database (Database): A connected postgresql database
+        """
+        # pylint: disable=protected-access
+        backend = database._backend
+        self._pool = backend._pool
+        backend._pool = MonitoredPool(self._pool, self)
+        # pylint: enable=protected-access
+
+    async def acquire(self, pool):
+        """Acquire a connection from an asyncpg pool
+
+        Args:
+            pool (asyncpg.Pool): The pool
+
+        Raises:
+            OverloadedException: If no connection was available in time
+
+        Returns:
+            asyncpg.Connection: The connection
+        """
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            connection = await pool.acquire(timeout=self.acquire_timeout)
+            self.acquisitions += 1
+        except asyncio.TimeoutError as exc:
+            self.timeouts += 1
+            raise OverloadedException("No database connection available") from exc
+        finally:
+            waited = time.perf_counter() - start
+            self.waiting -= 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return connection
+
+    def stats(self) -> Dict[str, float]:
+        """Statistics of the pool
+
+        Returns:
+            Dict[str, float]: Pool sizes, connections in use and idle, callers
+                waiting for a connection and acquire wait times
+        """
+        if self._pool is None:
+            return {}
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        return {
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": self.waiting,
+            "acquisitions": self.acquisitions,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+class MonitoredPool:  # pylint: disable=too-few-public-methods
+    """Proxy of an asyncpg pool acquiring connections through a PoolMonitor"""
+
+    def __init__(self, pool, monitor: PoolMonitor):
+        self._pool = pool
+        self._monitor = monitor
+
+    async def acquire(self):
+        """Acquire a connection, see `PoolMonitor.acquire`"""
+        return await self._monitor.acquire(self._pool)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
@@ -0,0 +1,171 @@
+"""On-demand profiling of where requests spend their time"""
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# pylint: disable=relative-beyond-top-level
+from .metrics import UNMATCHED_ROUTE
+
+# Seconds spent per phase by the current request, None unless it is profiled
+_request_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_phases", default=None
+)
+
+# Time of a profiled request outside of the observed phases: routing,
+# dependency resolution, validation, the endpoint itself, serialization and
+# waiting for the event loop
+FRAMEWORK_PHASE = "framework"
+
+
+def observe_phase(phase: str, seconds: float):
+    """Record time spent in a phase, e.g. `db`, `jwt` or `bcrypt`, if the
+    current request is profiled
+
+    Args:
+        phase (str): The phase
+        seconds (float): Time spent in the phase
+    """
+    phases = _request_phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+class Profiler:
+    """Aggregates the time spent per route and phase by a sample of the
+    requests made during a profiling window
+
+    The middleware samples and records requests while the profiling endpoints
+    open and close windows, all on the event loop, so the counters and stacks
+    are updated without locks. A request sampled before `start` and ending
+    after it is recorded in the new window.
+    """
+
+    def __init__(self):
+        self.every = 1
+        self.until = 0.0
+        self.requests = 0
+        self.samples = 0
+        self._stacks: Counter = Counter()
+
+    def start(self, duration: float, every: int = 1):
+        """Start a profiling window, discarding the results of earlier ones
+
+        Args:
+            duration (float): Length of the window in seconds
+            every (int): Profile one in this many requests
+        """
+        self.every = max(every, 1)
+        self.until = time.monotonic() + duration
+        self.requests = 0
+        self.samples = 0
+        self._stacks.clear()
+
+    def stop(self):
+        """End the profiling window, keeping its results"""
+        self.until = 0.0
+
+    @property
+    def active(self) -> bool:
+        """Whether a profiling window is open"""
+        return time.monotonic() < self.until
+
+    def sample(self) -> bool:
+        """Decide whether to profile a request
+
+        Returns:
+            bool: Whether the request is profiled
+        """
+        if not self.until or not self.active:
+            return False
+        self.requests += 1
+        return self.requests % self.every == 0
+
+    def record(self, route: str, phases: Dict[str, float], elapsed: float):
+        """Add a profiled request to the results
+
+        Args:
+            route (str): The path of the route
+            phases (Dict[str, float]): Seconds spent per phase
+            elapsed (float): Total seconds spent on the request
+        """
+        self.samples += 1
+        for phase, seconds in phases.items():
+            self._stacks[f"{route};{phase}"] += seconds
+        self._stacks[f"{route};{FRAMEWORK_PHASE}"] += max(
+            elapsed - sum(phases.values()), 0.0
+        )
+
+    def collapsed(self) -> str:
+        """The results in the collapsed stack format of flame graph tools,
+        one `route;phase microseconds` line per route and phase
+
+        Returns:
+            str: The collapsed stacks
+        """
+        return "".join(
+            f"{stack} {round(seconds * 1e6)}\n"
+            for stack, seconds in sorted(self._stacks.items())
+        )
+
+    def stats(self) -> Dict[str, float]:
+        """Statistics of the profiler
+
+        Returns:
+            Dict[str, float]: Whether a window is open, the requests made and
+                those profiled during the last window
+        """
+        return {
+            "active": int(self.active),
+            "requests": self.requests,
+            "samples": self.samples,
+        }
+
+
+class ProfilerMiddleware:  # pylint: disable=too-few-public-methods
+    """ASGI middleware profiling the requests sampled by a profiler, labelled
+    by the path of the matched route
+
+    Args:
+        app (ASGIApp): The wrapped application
+        profiler (Profiler): The profiler
+        routes (Callable): Returns the routes of the application, as objects
+            with `endpoint` and `path` attributes
+    """
+
+    def __init__(self, app: ASGIApp, profiler: Profiler, routes: Callable):
+        self.app = app
+        self.profiler = profiler
+        self._routes = routes
+        self._paths: Dict[Callable, str] = {}
+
+    def _path_for(self, endpoint: Optional[Callable]) -> str:
+        path = self._paths.get(endpoint)
+        if path is None:
+            path = next(
+                (
+                    route.path
+                    for route in self._routes()
+                    if getattr(route, "endpoint", None) is endpoint
+                ),
+                UNMATCHED_ROUTE,
+            )
+            self._paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.profiler.sample():
+            await self.app(scope, receive, send)
+            return
+
+        phases: Dict[str, float] = {}
+        token = _request_phases.set(phases)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_phases.reset(token)
+            self.profiler.record(self._path_for(scope.get("endpoint")), phases, elapsed)
@@ -0,0 +1,134 @@
+"""Rate and concurrency limits protecting the service from bursts of logins"""
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator
+
+# pylint: disable=relative-beyond-top-level
+from .exceptions import OverloadedException
+
+
+class TokenBucketLimiter:
+    """Token buckets by key, e.g. by username or client address
+
+    Each key may make `burst` calls at once, after which its bucket refills
+    at `rate` calls per second. Full buckets need no state, so only the most
+    recently used `maxsize` buckets are kept and evicted buckets start over
+    full. `acquire` reads and writes back a bucket without awaiting, so the
+    logins and log events of concurrent requests never take the same token
+    twice, as long as they call it from the event loop rather than threads.
+
+    Args:
+        rate (float): Calls per second each key is allowed in the long run,
+            must be positive
+        burst (int): Calls each key is allowed at once
+        maxsize (int): Maximum number of buckets
+    """
+
+    def __init__(self, rate: float, burst: int, maxsize: int):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        # Tokens and time of the last update by key
+        self._buckets: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.rejections = 0
+        self.evictions = 0
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        self._buckets.move_to_end(key)
+        return min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def check(self, key: Hashable) -> float:
+        """Check if the bucket of a key has a token, without taking it
+
+        Rejected checks are counted as rejections.
+
+        Args:
+            key (Hashable): The key
+
+        Returns:
+            float: 0 if a call would be allowed, otherwise the number of
+                seconds until it would be
+        """
+        tokens = self._tokens(key, time.monotonic())
+        if tokens < 1:
+            self.rejections += 1
+            return (1 - tokens) / self.rate
+        return 0.0
+
+    def acquire(self, key: Hashable) -> float:
+        """Take a token from the bucket of a key
+
+        Args:
+            key (Hashable): The key
+
+        Returns:
+            float: 0 if the call is allowed, otherwise the number of seconds
+                until it would be
+        """
+        now = time.monotonic()
+        tokens = self._tokens(key, now)
+
+        if tokens < 1:
+            self.rejections += 1
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+        return 0.0
+
+    def stats(self) -> Dict[str, int]:
+        """Usage counters of the limiter
+
+        Returns:
+            Dict[str, int]: Number of buckets, rejected calls and evicted
+                buckets
+        """
+        return {
+            "size": len(self._buckets),
+            "rejections": self.rejections,
+            "evictions": self.evictions,
+        }
+
+
+class ConcurrencyLimiter:
+    """Limits the number of calls in progress
+
+    Args:
+        limit (int): Maximum number of calls in progress
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.rejections = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the slots while the context is active
+
+        Raises:
+            OverloadedException: If all slots are taken
+        """
+        if self.active >= self.limit:
+            self.rejections += 1
+            raise OverloadedException("Too many concurrent logins")
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """Usage counters of the limiter
+
+        Returns:
+            Dict[str, int]: Number of calls in progress and rejected calls
+        """
+        return {"active": self.active, "rejections": self.rejections}
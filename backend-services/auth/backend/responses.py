@@ -0,0 +1,86 @@
+"""Fast JSON encoding of responses
+
+orjson is used when it is installed, otherwise the standard library json
+module with the same output as Starlette's `JSONResponse`.
+"""
+import json
+from typing import Any, Dict, Mapping, Optional
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact UTF-8 JSON
+
+    Args:
+        content (Any): The content
+
+    Raises:
+        TypeError: If the content cannot be encoded
+
+    Returns:
+        bytes: The JSON document, where orjson encodes NaN and infinite floats
+            as null
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """A `JSONResponse` encoded with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def record_dict(record: Mapping) -> Dict[str, Any]:
+    """Convert a database record to a dict of its column values
+
+    Reads the underlying asyncpg record directly, skipping the column lookup
+    and result processing that `databases` does per value. The columns must
+    therefore be of types without result processing, such as integers,
+    strings and booleans, as are those of the users listed by the service.
+
+    Args:
+        record (Mapping): A record of `databases`, or any mapping
+
+    Returns:
+        Dict[str, Any]: The column values by name
+    """
+    return dict(getattr(record, "_mapping", record))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an `If-None-Match` header against the ETag of a resource, with
+    the weak comparison of RFC 7232
+
+    Args:
+        if_none_match (str, optional): The header value
+        etag (str): The quoted ETag of the resource
+
+    Returns:
+        bool: Whether the client has the current version of the resource
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,209 @@
+"""Token revocation list with an in-memory Bloom filter"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+from databases import Database
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+# pylint: disable=relative-beyond-top-level,no-name-in-module
+from . import models
+from .cache import TTLCache
+from .tasks import BackgroundTask
+
+LOGGER = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """A set of strings without false negatives and with a bounded rate of
+    false positives, taking about 10 bits per item at a 1% rate
+
+    Args:
+        capacity (int): Number of items at which the false positive rate
+            reaches `error_rate`
+        error_rate (float): False positive rate at capacity
+    """
+
+    __slots__ = ("size", "hashes", "count", "_bits")
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing derives all positions from one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, item: str):
+        """Add an item
+
+        Args:
+            item (str): The item
+        """
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationList(BackgroundTask):
+    """Revoked token IDs (`jti` claims), stored in the user database and
+    mirrored by a Bloom filter in memory
+
+    A token that is not in the filter is not revoked, which answers the
+    common case without a database lookup. Tokens in the filter are looked
+    up to rule out false positives, which are then remembered until the
+    token expires, so that a token falsely in the filter is not looked up on
+    every request. The filter is rebuilt from the database every
+    `sync_interval` seconds, which picks up tokens revoked by other replicas
+    and drops expired ones.
+
+    Args:
+        database (Database): The user database
+        capacity (int): Minimum capacity of the filter, it grows with the
+            number of revoked tokens. Also the number of false positives
+            remembered.
+        error_rate (float): False positive rate of the filter at capacity
+        sync_interval (float): Seconds between rebuilds of the filter
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        capacity: int,
+        error_rate: float,
+        sync_interval: float,
+    ):
+        super().__init__(sync_interval)
+        self.database = database
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.filter = BloomFilter(capacity, error_rate)
+        self.counts: Counter = Counter(lookups=0, false_positives=0, syncs=0)
+        # Token IDs in the filter that are not revoked, by themselves. Those
+        # of tokens without expiry are looked up again after a sync interval.
+        self._not_revoked = TTLCache(maxsize=capacity, ttl=sync_interval)
+        self._revoked_during_sync = None
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """Probe the filter for a token ID
+
+        Args:
+            jti (str): The token ID
+
+        Returns:
+            bool: False if the token is certainly not revoked
+        """
+        return jti in self.filter
+
+    async def is_revoked(self, jti: str, expires: Optional[float] = None) -> bool:
+        """Evaluate if a token ID is revoked, looking it up in the database
+        if it is in the filter and not known to be a false positive
+
+        Args:
+            jti (str): The token ID
+            expires (float, optional): Expiry of the token as a POSIX
+                timestamp, the `exp` claim, until which a false positive is
+                remembered
+
+        Returns:
+            bool: Revoked or not
+        """
+        if jti not in self.filter or jti in self._not_revoked:
+            return False
+        self.counts["lookups"] += 1
+        # A token revoked while the query is in flight must not be remembered
+        version = self._not_revoked.version
+        table = models.revoked_tokens
+        query = select([table.c.jti]).where(
+            table.c.jti == jti,
+            or_(table.c.expires.is_(None), table.c.expires > datetime.utcnow()),
+        )
+        revoked = await self.database.fetch_val(query) is not None
+        if not revoked:
+            self.counts["false_positives"] += 1
+            ttl = None if expires is None else expires - time.time()
+            self._not_revoked.set(jti, jti, ttl=ttl, version=version)
+        return revoked
+
+    async def revoke(self, jti: str, expires: Optional[datetime]):
+        """Revoke a token
+
+        Args:
+            jti (str): The token ID
+            expires (datetime, optional): Expiry of the token in UTC, after
+                which it need not be remembered. Never if None.
+        """
+        await self.database.execute(
+            insert(models.revoked_tokens)
+            .values(jti=jti, expires=expires)
+            .on_conflict_do_nothing()
+        )
+        self.filter.add(jti)
+        self._not_revoked.pop(jti)
+        if self._revoked_during_sync is not None:
+            self._revoked_during_sync.append(jti)
+
+    async def sync(self):
+        """Delete expired tokens from the database and rebuild the filter
+        from the remaining ones"""
+        table = models.revoked_tokens
+        now = datetime.utcnow()
+        self._revoked_during_sync = []
+        try:
+            await self.database.execute(table.delete().where(table.c.expires <= now))
+            records = await self.database.fetch_all(select([table.c.jti]))
+            # Tokens revoked by this replica while the query ran may be missing
+            jtis = [record["jti"] for record in records] + self._revoked_during_sync
+        finally:
+            self._revoked_during_sync = None
+
+        bloom_filter = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom_filter.add(jti)
+        self.filter = bloom_filter
+        # Forget the false positives revoked since, e.g. by other replicas
+        revoked = set(jtis)
+        self._not_revoked.pop_where(lambda jti: jti in revoked)
+        self.counts["syncs"] += 1
+
+    async def run(self):
+        """Rebuild the filter periodically"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sync()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Cannot sync the token revocation list")
+
+    def stats(self) -> Dict[str, float]:
+        """Statistics of the revocation list
+
+        Returns:
+            Dict[str, float]: Tokens in the filter, its size in bits, database
+                lookups of tokens in the filter, false positives, those
+                remembered and syncs
+        """
+        return {
+            "filter_items": self.filter.count,
+            "filter_bits": self.filter.size,
+            "not_revoked": len(self._not_revoked),
+            **self.counts,
+        }
@@ -0,0 +1,190 @@
+"""Routes streaming users in and out of the user database"""
+import asyncio
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select
+
+# pylint: disable=import-error, relative-beyond-top-level, no-name-in-module
+from .. import schemas
+from .. import models
+from ..bulk import (
+    CSV_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    read_csv,
+    read_ndjson,
+    write_csv,
+    write_ndjson,
+)
+from ..config import EXPORT_BATCH_SIZE, IMPORT_BATCH_SIZE, IMPORT_HASH_WORKERS
+from ..dependencies import (
+    USER_LIST_COLUMNS,
+    database,
+    user_changed,
+    verify_token_admin,
+)
+from ..passwords import PasswordHasher
+from ..responses import record_dict
+
+router = APIRouter()
+
+# Bulk imports hash on their own pool so that logins are not queued behind them
+import_password_hasher = PasswordHasher(
+    workers=IMPORT_HASH_WORKERS, queue_limit=IMPORT_BATCH_SIZE
+)
+
+USER_IMPORT_COLUMNS = (
+    "username",
+    "firstname",
+    "lastname",
+    "email",
+    "admin",
+    "hashed_password",
+    "path_whitelist",
+    "path_blacklist",
+    "topic_whitelist",
+    "topic_blacklist",
+)
+
+
+@router.get("/users/export", dependencies=[Depends(verify_token_admin)])
+async def export_users(output_format: str = Query("ndjson", alias="format")):
+    """Stream all users as newline delimited JSON (`format=ndjson`) or as CSV
+    with a header line (`format=csv`)"""
+    if output_format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=422, detail=f"Invalid format {output_format}")
+    names = [column.name for column in USER_LIST_COLUMNS]
+
+    def write(records):
+        if output_format == "csv":
+            return write_csv([record[name] for name in names] for record in records)
+        return write_ndjson(record_dict(record) for record in records)
+
+    async def content():
+        if output_format == "csv":
+            yield write_csv([names])
+        query = select(USER_LIST_COLUMNS).order_by(models.users.c.id)
+        batch = []
+        async for record in database.iterate(query):
+            batch.append(record)
+            if len(batch) == EXPORT_BATCH_SIZE:
+                yield write(batch)
+                batch = []
+        if batch:
+            yield write(batch)
+
+    return StreamingResponse(
+        content(),
+        media_type=CSV_MEDIA_TYPE if output_format == "csv" else NDJSON_MEDIA_TYPE,
+    )
+
+
+@router.post("/users/import", dependencies=[Depends(verify_token_admin)])
+async def import_users(request: Request):
+    """Create users from a streamed request body of newline delimited JSON
+    (`Content-Type: application/x-ndjson`) or CSV with a header line
+    (`Content-Type: text/csv`), with the fields of `POST /users`
+
+    Instead of a password, a user may have the `hashed_password` of a
+    bcrypt hash, which saves hashing it during the import.
+
+    Users are inserted in batches, existing usernames are skipped and
+    invalid users are reported by line number. A malformed line aborts the
+    import, leaving the batches before it imported."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == CSV_MEDIA_TYPE:
+        items = read_csv(request.stream())
+    elif content_type == NDJSON_MEDIA_TYPE:
+        items = read_ndjson(request.stream())
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Expected {NDJSON_MEDIA_TYPE} or {CSV_MEDIA_TYPE}",
+        )
+
+    result = {"inserted": 0, "skipped": [], "errors": []}
+
+    async def flush(batch):
+        inserted = await insert_users(batch)
+        result["inserted"] += len(inserted)
+        for user in batch:
+            if user.username.lower() in inserted:
+                inserted.remove(user.username.lower())
+            else:
+                result["skipped"].append(user.username.lower())
+        user_changed(None)
+
+    batch = []
+    try:
+        async for number, item in items:
+            try:
+                batch.append(schemas.ImportUser(**item))
+            except ValidationError as exc:
+                result["errors"].append({"line": number, "detail": exc.errors()})
+                continue
+            if len(batch) == IMPORT_BATCH_SIZE:
+                await flush(batch)
+                batch = []
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=422, detail={"message": str(exc), **result}
+        ) from exc
+    if batch:
+        await flush(batch)
+
+    return result
+
+
+async def insert_users(users: List[schemas.ImportUser]) -> set:
+    """Hash the passwords of users in parallel and insert the users with
+    COPY, skipping usernames that already exist
+
+    Args:
+        users (List[ImportUser]): The users to insert
+
+    Returns:
+        set: The usernames that were inserted
+    """
+
+    async def hashed_password(user: schemas.ImportUser) -> str:
+        if user.hashed_password is not None:
+            return user.hashed_password
+        return await import_password_hasher.hash(user.password)
+
+    hashed_passwords = await asyncio.gather(*map(hashed_password, users))
+    rows = [
+        (
+            user.username.lower(),
+            user.firstname,
+            user.lastname,
+            user.email,
+            user.admin,
+            hashed_password,
+            user.path_whitelist,
+            user.path_blacklist,
+            user.topic_whitelist,
+            user.topic_blacklist,
+        )
+        for user, hashed_password in zip(users, hashed_passwords)
+    ]
+
+    columns = ", ".join(USER_IMPORT_COLUMNS)
+    table = models.users.name
+    async with database.connection() as connection:
+        raw_connection = connection.raw_connection
+        async with raw_connection.transaction():
+            await raw_connection.execute(
+                f"CREATE TEMPORARY TABLE {table}_import ON COMMIT DROP AS "
+                f"SELECT {columns} FROM {table} WITH NO DATA"
+            )
+            await raw_connection.copy_records_to_table(
+                f"{table}_import", records=rows, columns=USER_IMPORT_COLUMNS
+            )
+            records = await raw_connection.fetch(
+                f"INSERT INTO {table} ({columns}) "
+                f"SELECT {columns} FROM {table}_import "
+                "ON CONFLICT (username) DO NOTHING RETURNING username"
+            )
+    return {record["username"] for record in records}
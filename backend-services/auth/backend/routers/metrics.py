@@ -0,0 +1,70 @@
+"""Routes serving usage counters and Prometheus metrics"""
+from typing import Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+
+# pylint: disable=import-error, relative-beyond-top-level, no-name-in-module
+from ..dependencies import (
+    acl_version_cache,
+    change_listener,
+    client_login_limiter,
+    decision_log,
+    login_concurrency_limiter,
+    pool_monitor,
+    profiler,
+    revocation_list,
+    token_cache,
+    unknown_user_cache,
+    user_cache,
+    username_login_limiter,
+    verify_token_admin,
+)
+from ..metrics import StatsCollector
+
+router = APIRouter()
+
+
+def collect_stats() -> Dict[str, Dict[str, float]]:
+    """Collect usage counters of the in-process caches, the database pool, the
+    user change listener, the token revocation list, the login limits, the
+    decision log and the profiler"""
+    return {
+        "user_cache": user_cache.stats(),
+        "unknown_user_cache": unknown_user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "acl_version_cache": acl_version_cache.stats(),
+        "database_pool": pool_monitor.stats(),
+        "user_changes": change_listener.stats(),
+        "token_revocation": revocation_list.stats(),
+        "username_login_limit": username_login_limiter.stats(),
+        "client_login_limit": client_login_limiter.stats(),
+        "login_concurrency": login_concurrency_limiter.stats(),
+        "decision_log": decision_log.stats(),
+        "profiler": profiler.stats(),
+    }
+
+
+REGISTRY.register(StatsCollector(collect_stats))
+
+
+@router.get("/stats", dependencies=[Depends(verify_token_admin)])
+async def get_stats():
+    """Get usage counters, see `collect_stats`"""
+    return collect_stats()
+
+
+def check_not_proxied(request: Request):
+    """Reject requests forwarded by a reverse proxy, so that metrics are only
+    served to scrapers reaching the service on the internal network"""
+    if "X-Forwarded-For" in request.headers:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get(
+    "/metrics", dependencies=[Depends(check_not_proxied)], include_in_schema=False
+)
+async def get_metrics():
+    """Get metrics in the Prometheus text format"""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,49 @@
+"""Routes profiling requests on demand, see `PROFILER_ENABLED`"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+
+# pylint: disable=import-error, relative-beyond-top-level, no-name-in-module
+from ..config import PROFILER_ENABLED
+from ..dependencies import profiler, verify_token_admin
+
+router = APIRouter()
+
+
+def check_profiler_enabled():
+    """Reject profiling requests unless PROFILER_ENABLED is set"""
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+
+@router.post(
+    "/profile",
+    dependencies=[Depends(verify_token_admin), Depends(check_profiler_enabled)],
+)
+async def start_profiler(
+    duration: float = Query(60, gt=0, le=3600), every: int = Query(1, ge=1)
+):
+    """Profile one in `every` requests for `duration` seconds, discarding the
+    results of earlier profiles"""
+    profiler.start(duration, every)
+    return profiler.stats()
+
+
+@router.delete(
+    "/profile",
+    dependencies=[Depends(verify_token_admin), Depends(check_profiler_enabled)],
+)
+async def stop_profiler():
+    """Stop profiling, keeping the results"""
+    profiler.stop()
+    return profiler.stats()
+
+
+@router.get(
+    "/profile",
+    dependencies=[Depends(verify_token_admin), Depends(check_profiler_enabled)],
+)
+async def get_profile():
+    """Get the time spent by the profiled requests per route and phase (`db`,
+    `jwt`, `bcrypt` and `framework`, the rest) in microseconds, as collapsed
+    stacks for flame graph tools"""
+    return Response(profiler.collapsed(), media_type="text/plain")
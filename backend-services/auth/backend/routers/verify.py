@@ -0,0 +1,222 @@
+"""Routes authorizing requests: forwardauth by Traefik, ACL checks by EMQX
+and batches of both"""
+from typing import Optional, Tuple
+from urllib import parse
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from jose.exceptions import JWTError
+from starlette.responses import RedirectResponse
+from starlette.routing import Route
+
+# pylint: disable=import-error, relative-beyond-top-level, no-name-in-module
+from .. import schemas
+from ..acl import UserACL, compile_path_acl, compile_topic_acl
+from ..config import VERIFY_FAST_PATH
+from ..dependencies import (
+    decode_token,
+    fetch_user,
+    fetch_user_acl,
+    get_acl_from_bearer_token,
+    get_claims_from_bearer_token,
+    oauth2_scheme,
+)
+from ..exceptions import VerifyException
+from ..metrics import count_acl_decision
+from ..responses import FastJSONResponse
+from ..utils import looks_like_jwt
+
+router = APIRouter()
+
+
+def verify_exception_response(request: Request, exc: VerifyException) -> Response:
+    """Respond to a failed verification with a redirect to the login page, or
+    with 401 Unauthorized for API requests
+
+    Args:
+        request (Request): The forwardauth request
+        exc (VerifyException): The reason
+
+    Returns:
+        Response: The response
+    """
+    uri = request.headers.get("X-Forwarded-Uri", "")
+    host = request.headers.get("X-Forwarded-Host", "")
+
+    if "/api/" in uri:
+        return FastJSONResponse(status_code=401, content={"detail": exc.message})
+
+    redirect_url = (
+        "http://"
+        + host
+        + "/auth?url="
+        + parse.quote("http://" + host + uri)
+        + "&message="
+        + parse.quote(exc.message)
+    )
+    return RedirectResponse(redirect_url)
+
+
+def authorize_uri(user_acl: Optional[UserACL], message: str, uri: str):
+    """Check that a user may access a forwarded URI
+
+    Args:
+        user_acl (UserACL, optional): The user's ACL, None if unauthenticated
+        message (str): Why the user is unauthenticated
+        uri (str): The forwarded URI
+
+    Raises:
+        VerifyException: If access is not allowed
+    """
+    if user_acl is None:
+        raise VerifyException(message)
+
+    # Limit access to non-administrators
+    if "admin" in uri:
+        count_acl_decision("admin", user_acl.admin)
+        if not user_acl.admin:
+            raise VerifyException("Unauthorized access")
+
+    # Access Control List checks
+    acl = compile_path_acl(user_acl.path_whitelist, user_acl.path_blacklist)
+    allowed = acl.allows(uri)
+    count_acl_decision("path", allowed)
+    if not allowed:
+        raise VerifyException(f"Unauthorized access to {uri}")
+
+
+MISSING_FORWARDED_HEADERS = "Missing required X-Forwarded-Headers provided by Traefik"
+
+
+@router.get("/verify", response_model=schemas.Response)
+async def verify_request(
+    request: Request,
+    acl_tuple: Tuple[UserACL, str] = Depends(get_acl_from_bearer_token),
+):
+    """Verify that the user has the permissions for the request"""
+
+    uri = request.headers.get("X-Forwarded-Uri")
+    host = request.headers.get("X-Forwarded-Host")
+
+    if not host or not uri:
+        raise HTTPException(400, MISSING_FORWARDED_HEADERS)
+
+    authorize_uri(*acl_tuple, uri)
+    return FastJSONResponse(status_code=200, content={"success": True})
+
+
+async def verify_request_fast(request: Request) -> Response:
+    """Starlette endpoint of `/verify` with the semantics of `verify_request`,
+    but without FastAPI's dependency resolution, request validation and
+    exception handler round trip"""
+    uri = request.headers.get("X-Forwarded-Uri")
+    host = request.headers.get("X-Forwarded-Host")
+
+    if not host or not uri:
+        return FastJSONResponse(
+            status_code=400, content={"detail": MISSING_FORWARDED_HEADERS}
+        )
+
+    claims_tuple = await get_claims_from_bearer_token(await oauth2_scheme(request))
+    user_acl, message = await get_acl_from_bearer_token(claims_tuple)
+    try:
+        authorize_uri(user_acl, message, uri)
+    except VerifyException as exc:
+        return verify_exception_response(request, exc)
+    return FastJSONResponse(status_code=200, content={"success": True})
+
+
+# Matched before the FastAPI route, which remains for the API documentation
+if VERIFY_FAST_PATH:
+    router.routes.insert(
+        0,
+        Route("/verify", verify_request_fast, methods=["GET"], include_in_schema=False),
+    )
+
+
+async def fetch_emqx_acl(username: str) -> UserACL:
+    """Fetch the ACL of the user for a username given by an EMQX client,
+    which is either an actual username or a JWT
+
+    Usernames shaped like a JWT are verified as tokens first, without a
+    lookup of the token as a username. Those that fail verification are
+    looked up as usernames like any other.
+
+    Args:
+        username (str): The username or JWT
+
+    Raises:
+        HTTPException: 401 if there is no such user
+
+    Returns:
+        UserACL: The user's ACL
+    """
+    if looks_like_jwt(username):
+        try:
+            claims = await decode_token(username)
+        except JWTError:
+            pass
+        else:
+            user_acl = await fetch_user_acl(claims) if "sub" in claims else None
+            if user_acl is None:
+                raise HTTPException(401, "Unauthorized")
+            return user_acl
+
+    user = await fetch_user(username)
+    if user is None:
+        raise HTTPException(401, "Unauthorized")
+    return UserACL.of(user)
+
+
+@router.get("/verify_emqx")
+async def verify_emqx(
+    username: str,
+    topic: str,
+):
+    """Authenticate and authorize a request according to EMQX HTTP ACL plugin"""
+
+    user_acl = await fetch_emqx_acl(username)
+
+    # ACL checks
+    acl = compile_topic_acl(user_acl.topic_whitelist, user_acl.topic_blacklist)
+    allowed = acl.allows(topic)
+    count_acl_decision("topic", allowed)
+    if not allowed:
+        raise HTTPException(403, f"Access is not allowed to {topic}")
+    # Accepted!
+    return FastJSONResponse("Authorized")
+
+
+@router.post("/verify_batch", response_model=schemas.VerifyBatchResult)
+async def verify_batch(batch: schemas.VerifyBatch):
+    """Authorize many topics and URIs for one user with a single user lookup
+
+    The results are lists of booleans in the order of the requested topics
+    and URIs. Topics are checked as in `/verify_emqx` and URIs as in
+    `/verify`. URIs are only authorized for a token, not for a username.
+    """
+    if batch.token is not None:
+        try:
+            claims = await decode_token(batch.token)
+        except JWTError as exc:
+            raise HTTPException(401, "Unauthorized") from exc
+        user_acl = await fetch_user_acl(claims)
+        if user_acl is None:
+            raise HTTPException(401, "Unauthorized")
+    else:
+        user_acl = await fetch_emqx_acl(batch.username)
+
+    topic_acl = compile_topic_acl(user_acl.topic_whitelist, user_acl.topic_blacklist)
+    path_acl = compile_path_acl(user_acl.path_whitelist, user_acl.path_blacklist)
+
+    topics = [topic_acl.allows(topic) for topic in batch.topics]
+    uris = [
+        (user_acl.admin or "admin" not in uri) and path_acl.allows(uri)
+        for uri in batch.uris
+    ]
+    for allowed in topics:
+        count_acl_decision("topic", allowed)
+    for allowed in uris:
+        count_acl_decision("path", allowed)
+
+    return {"topics": topics, "uris": uris}
@@ -3,8 +3,17 @@ Schemas
 """
 # pylint: disable=no-name-in-module, too-few-public-methods, missing-class-docstring,
 # pylint: disable=missing-function-docstring, no-self-argument, use-a-generator
-from typing import Optional
-from pydantic import BaseModel, root_validator
+import re
+from typing import List
+from pydantic import BaseModel, conlist, create_model, root_validator, validator
+
+# pylint: disable=relative-beyond-top-level
+from .acl import UserACL
+
+BCRYPT_HASH = re.compile(r"^\$2[aby]?\$\d\d\$[./A-Za-z0-9]{53}$")
+
+# Maximum number of topics, and of URIs, authorized by one batch request
+VERIFY_BATCH_MAX_ITEMS = 1000
 
 
 class Response(BaseModel):
@@ -12,22 +21,49 @@ class Response(BaseModel):
     detail: str = None
 
 
-class CreateUser(BaseModel):
+# The access control fields of a user as defined by `acl.UserACL`, the lists
+# are optional
+UserACLFields = create_model(  # pylint: disable=invalid-name
+    "UserACLFields",
+    **{
+        name: (kind, ... if kind is bool else None)
+        for name, kind in UserACL.__annotations__.items()
+    },
+)
+
+
+class CreateUser(UserACLFields):
     username: str
     firstname: str
     lastname: str
     email: str
     password: str
-    admin: bool
-    path_whitelist: Optional[str]
-    path_blacklist: Optional[str]
-    topic_whitelist: Optional[str]
-    topic_blacklist: Optional[str]
 
     class Config:
         orm_mode = True
 
 
+class ImportUser(UserACLFields):
+    username: str
+    firstname: str
+    lastname: str
+    email: str
+    password: str = None
+    hashed_password: str = None
+
+    @validator("hashed_password")
+    def check_bcrypt_hash(cls, value):
+        if value is not None and not BCRYPT_HASH.match(value):
+            raise ValueError("Expected a bcrypt hash")
+        return value
+
+    @root_validator(skip_on_failure=True)
+    def check_exactly_one_password(cls, values):
+        if (values.get("password") is None) == (values.get("hashed_password") is None):
+            raise ValueError("Expected either a password or a hashed_password.")
+        return values
+
+
 class UserOut(BaseModel):
     id: int
     username: str
@@ -60,3 +96,28 @@ class ModifyUser(BaseModel):
         if all([value is None for value in values.values()]):
             raise ValueError("The request body should contain at least one field.")
         return values
+
+
+class VerifyBatch(BaseModel):
+    username: str = None
+    token: str = None
+    topics: conlist(str, max_items=VERIFY_BATCH_MAX_ITEMS) = []
+    uris: conlist(str, max_items=VERIFY_BATCH_MAX_ITEMS) = []
+
+    @root_validator(skip_on_failure=True)
+    def check_exactly_one_identity(cls, values):
+        if (values.get("username") is None) == (values.get("token") is None):
+            raise ValueError("The request body should contain a username or a token.")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def check_uris_have_a_token(cls, values):
+        # Usernames are not secret, so they only grant the topic checks of EMQX
+        if values.get("uris") and values.get("token") is None:
+            raise ValueError("URIs can only be authorized for a token.")
+        return values
+
+
+class VerifyBatchResult(BaseModel):
+    topics: List[bool]
+    uris: List[bool]
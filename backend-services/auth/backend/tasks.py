@@ -0,0 +1,34 @@
+"""Components running in the background of the service"""
+import asyncio
+from typing import Optional
+
+
+class BackgroundTask:
+    """Base of the components that run `run` in a background task between
+    `start` and `stop`
+
+    Args:
+        interval (float): Seconds between the iterations or retries of `run`
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Future] = None
+
+    async def run(self):
+        """Do the work of the component until cancelled"""
+        raise NotImplementedError
+
+    def start(self):
+        """Start running in a background task, so that startup is not blocked"""
+        self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        """Cancel the background task and wait for it to end"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
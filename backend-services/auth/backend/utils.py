@@ -1,10 +1,18 @@
 """Utilities"""
+import base64
+import json
+import re
 from itertools import zip_longest
+from typing import Any, List, Sequence
 
 SEPARATOR = "/"
 SINGLE = "+"
 ALL = "#"
 
+# Three base64url segments, header and claims being JSON objects, i.e. starting
+# with '{"'
+JWT_SHAPE = re.compile(r"eyJ[A-Za-z0-9_-]*\.eyJ[A-Za-z0-9_-]*\.[A-Za-z0-9_-]+")
+
 
 def mqtt_match(pattern: str, topic: str) -> bool:
     """Evaluate if a topic matches a pattern
@@ -33,3 +41,73 @@ def mqtt_match(pattern: str, topic: str) -> bool:
 
     # If we get to here, we have no earlier mismatches
     return len(pattern_levels) == len(topic_levels)
+
+
+def validate_paths_text_string(text_string: str) -> bool:
+    """Validate that a text string containing pahts"""
+    if len(text_string) == 0:
+        return True
+    paths = text_string.split(",")
+    for path in paths:
+        if not re.match(r"/[a-z0-9/]+", path):
+            return False
+    return True
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the sort key of a row as an opaque pagination cursor
+
+    Args:
+        values (List[Any]): JSON serializable values of the sort key
+
+    Returns:
+        str: The cursor
+    """
+    data = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """Decode a pagination cursor created by `encode_cursor`
+
+    Args:
+        cursor (str): The cursor
+        types (Sequence[type]): The types of the values of the sort key, one
+            per value
+
+    Raises:
+        ValueError: If the cursor is malformed or its values are not of the
+            given types
+
+    Returns:
+        List[Any]: The values of the sort key
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Malformed cursor") from exc
+    # Booleans are ints to isinstance, so they are told apart explicitly
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(
+            isinstance(value, kind) and isinstance(value, bool) == (kind is bool)
+            for value, kind in zip(values, types)
+        )
+    ):
+        raise ValueError("Malformed cursor")
+    return values
+
+
+def looks_like_jwt(value: str) -> bool:
+    """Check whether a string has the shape of a compact JWS, without
+    decoding or verifying it
+
+    Args:
+        value (str): The string
+
+    Returns:
+        bool: Whether it could be a JWT
+    """
+    return JWT_SHAPE.fullmatch(value) is not None
@@ -0,0 +1,311 @@
+"""Micro-benchmarks of the primitives on the hot path
+
+Times `utils.mqtt_match`, `utils.validate_paths_text_string` and the
+compiled path and topic ACLs over a grid of pattern counts, topic depths
+and wildcard densities, as well as the creation of users from database
+records and the JSON encoding of user listings, and compares the results
+with the baselines stored in baselines.json. A benchmark fails if it is
+slower than its baseline by more than the threshold factor.
+
+Timings are stored relative to a fixed pure Python reference loop, timed
+right before and after each timing of a benchmark, so that baselines
+recorded on one machine remain meaningful on another. The result is the
+median over many such timings. The third-party implementations that those
+of the service are compared with, the ORM and the standard JSON encoding,
+are timed for reference only and never fail. Run from backend-services/auth:
+
+    python -m benchmarks.micro              # Compare with the baselines
+    python -m benchmarks.micro --update     # Record new baselines
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from starlette.responses import JSONResponse
+
+from backend.acl import compile_path_acl, compile_topic_acl
+from backend.models import User, UserSnapshot
+from backend.responses import FastJSONResponse
+from backend.utils import mqtt_match, validate_paths_text_string
+
+BASELINES = Path(__file__).with_name("baselines.json")
+DEFAULT_THRESHOLD = 1.5
+# Seconds that each timing of a benchmark or of the reference takes at least
+MIN_TIMING = 0.01
+
+# Timed for reference only, without a baseline
+REFERENCE_BENCHMARKS = frozenset(("user_record/orm", "user_list_json/users=100/stdlib"))
+
+PATTERN_COUNTS = (1, 10, 100)
+TOPIC_DEPTHS = (3, 8)
+WILDCARD_DENSITIES = (0.0, 0.5)
+REGEX_DENSITIES = (0.0, 0.5, 1.0)
+
+# A record of the users table, as returned by the database
+USER_RECORD = {
+    "id": 1,
+    "username": "benchmark",
+    "firstname": "Bench",
+    "lastname": "Mark",
+    "email": "benchmark@crowsnest.mo.ri.se",
+    "admin": False,
+    "path_whitelist": "/vessel0/,/vessel1/",
+    "path_blacklist": None,
+    "topic_whitelist": "vessel0/#",
+    "topic_blacklist": None,
+    "hashed_password": "$2b$12$" + 53 * "a",
+    "token": None,
+}
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--update", action="store_true", help="Store the results as new baselines"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        help="Maximum slowdown factor compared with the baselines, "
+        f"defaults to the stored threshold or {DEFAULT_THRESHOLD}",
+    )
+    parser.add_argument(
+        "--filter", default="", help="Only run benchmarks whose name contains this"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=21, help="Number of timings of each benchmark"
+    )
+    return parser.parse_args(argv)
+
+
+def reference():
+    """Fixed workload that the benchmarks are timed relative to"""
+    total = 0
+    for index in range(1000):
+        total += len(str(index).split("/"))
+    return total
+
+
+def topic_filters(count: int, depth: int, density: float) -> Tuple[List[str], str]:
+    """Topic filters and a topic only matched by the last of them
+
+    Args:
+        count (int): Number of filters
+        depth (int): Number of levels of the filters and the topic
+        density (float): Fraction of levels that are '+' wildcards
+
+    Returns:
+        Tuple[List[str], str]: The filters and the topic
+    """
+    rng = random.Random(count * depth)
+    filters = []
+    for index in range(count):
+        levels = [f"vessel{index}"] + [
+            "+" if rng.random() < density else f"level{level}"
+            for level in range(1, depth)
+        ]
+        filters.append("/".join(levels))
+    topic = filters[-1].replace("+", "value")
+    return filters, topic
+
+
+def path_patterns(count: int, density: float) -> Tuple[List[str], str]:
+    """Path patterns and a path only matched by the last of them
+
+    Args:
+        count (int): Number of patterns
+        density (float): Fraction of patterns that are regular expressions
+            rather than literal prefixes
+
+    Returns:
+        Tuple[List[str], str]: The patterns and the path
+    """
+    rng = random.Random(count)
+    patterns = [
+        f"/vessel{index}/[a-z]+/data" if rng.random() < density else f"/vessel{index}/"
+        for index in range(count)
+    ]
+    return patterns, f"/vessel{count - 1}/gnss/data"
+
+
+def benchmarks() -> Iterator[Tuple[str, Callable]]:
+    """The benchmarks, as names and functions to time"""
+    for count in PATTERN_COUNTS:
+        for depth in TOPIC_DEPTHS:
+            for density in WILDCARD_DENSITIES:
+                filters, topic = topic_filters(count, depth, density)
+                denied = "unknown/" + topic
+                acl = compile_topic_acl(",".join(filters), None)
+                name = f"patterns={count}/depth={depth}/wildcards={density}"
+
+                def loop(filters=filters, topic=topic, denied=denied):
+                    any(mqtt_match(pattern, topic) for pattern in filters)
+                    any(mqtt_match(pattern, denied) for pattern in filters)
+
+                def trie(acl=acl, topic=topic, denied=denied):
+                    acl.allows(topic)
+                    acl.allows(denied)
+
+                yield f"mqtt_match/{name}", loop
+                yield f"topic_acl/{name}", trie
+
+        for density in REGEX_DENSITIES:
+            patterns, path = path_patterns(count, density)
+            acl = compile_path_acl(",".join(patterns), None)
+
+            def matcher(acl=acl, path=path):
+                acl.allows(path)
+                acl.allows("/unknown" + path)
+
+            yield f"path_acl/patterns={count}/regex={density}", matcher
+
+        text_string = ",".join(f"/vessel{index}/data" for index in range(count))
+        yield (
+            f"validate_paths_text_string/patterns={count}",
+            lambda text_string=text_string: validate_paths_text_string(text_string),
+        )
+
+    yield "user_record/orm", lambda: User.from_record(USER_RECORD)
+    yield "user_record/snapshot", lambda: UserSnapshot.from_record(USER_RECORD)
+
+    users = [{**USER_RECORD, "id": index} for index in range(100)]
+    yield "user_list_json/users=100/stdlib", lambda: JSONResponse(users)
+    yield "user_list_json/users=100/fast", lambda: FastJSONResponse(users)
+
+
+def calibrate(timer: timeit.Timer) -> int:
+    """The number of calls that a timing needs to take at least `MIN_TIMING`
+    seconds"""
+    number = 1
+    while timer.timeit(number) < MIN_TIMING:
+        number *= 2
+    return number
+
+
+def measure(function: Callable, repeat: int) -> Tuple[float, float]:
+    """Time a function against the reference workload
+
+    Each timing of the function is taken between two timings of the
+    reference, so that both see the same speed of the machine, and the
+    medians over `repeat` such timings are kept.
+
+    Args:
+        function (Callable): The function
+        repeat (int): Number of timings
+
+    Returns:
+        Tuple[float, float]: Seconds per call and time relative to the
+            reference workload
+    """
+    reference_timer = timeit.Timer(reference)
+    reference_number = calibrate(reference_timer)
+    timer = timeit.Timer(function)
+    number = calibrate(timer)
+
+    seconds = []
+    ratios = []
+    for _ in range(repeat):
+        before = reference_timer.timeit(reference_number) / reference_number
+        seconds.append(timer.timeit(number) / number)
+        after = reference_timer.timeit(reference_number) / reference_number
+        ratios.append(seconds[-1] / statistics.mean((before, after)))
+    return statistics.median(seconds), statistics.median(ratios)
+
+
+def run(name_filter: str = "", repeat: int = 21) -> Dict[str, Dict[str, float]]:
+    """Run the benchmarks
+
+    Args:
+        name_filter (str): Only run benchmarks whose name contains this
+        repeat (int): Number of timings of each benchmark
+
+    Returns:
+        Dict[str, Dict[str, float]]: Time per call in nanoseconds and relative
+            to the reference workload, by benchmark name
+    """
+    results = {}
+    for name, function in benchmarks():
+        if name_filter in name:
+            seconds, relative = measure(function, repeat)
+            results[name] = {"ns": seconds * 1e9, "relative": relative}
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baselines: Dict[str, float], threshold: float
+) -> List[str]:
+    """Find the benchmarks that regressed
+
+    Args:
+        results (Dict[str, Dict[str, float]]): The results of `run`
+        baselines (Dict[str, float]): Baseline relative times by name
+        threshold (float): Maximum slowdown factor
+
+    Returns:
+        List[str]: Names of the benchmarks slower than threshold times their
+            baseline, reference benchmarks excepted
+    """
+    return [
+        name
+        for name, result in results.items()
+        if name in baselines
+        and name not in REFERENCE_BENCHMARKS
+        and result["relative"] > baselines[name] * threshold
+    ]
+
+
+def main(argv: List[str] = None) -> int:
+    """Entry point, returns the exit status"""
+    args = parse_args(argv)
+    stored = {"threshold": DEFAULT_THRESHOLD, "benchmarks": {}}
+    if BASELINES.exists():
+        stored = json.loads(BASELINES.read_text(encoding="utf-8"))
+    threshold = args.threshold or stored["threshold"]
+    baselines = stored["benchmarks"]
+
+    results = run(args.filter, args.repeat)
+    regressions = compare(results, baselines, threshold)
+
+    print(f"{'benchmark':<52}{'ns':>10}{'relative':>10}{'baseline':>10}")
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if name in REFERENCE_BENCHMARKS:
+            column = f"{'ref':>10}"
+        elif baseline:
+            column = f"{baseline:>10.4g}"
+        else:
+            column = f"{'new':>10}"
+        status = "FAIL" if name in regressions else ""
+        print(
+            f"{name:<52}{result['ns']:>10.0f}{result['relative']:>10.4g}"
+            + column
+            + f"  {status}"
+        )
+
+    if args.update:
+        baselines.update(
+            {
+                name: result["relative"]
+                for name, result in results.items()
+                if name not in REFERENCE_BENCHMARKS
+            }
+        )
+        stored["benchmarks"] = dict(sorted(baselines.items()))
+        BASELINES.write_text(json.dumps(stored, indent=2) + "\n", encoding="utf-8")
+        print(f"Stored baselines in {BASELINES}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmarks slower than {threshold}x the baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
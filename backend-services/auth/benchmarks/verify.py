@@ -0,0 +1,146 @@
+"""Per-request overhead of the /verify fast path compared with the FastAPI route
+
+Drives the complete ASGI app, middleware included, with prepared forwardauth
+requests, once with the Starlette fast path in front and once with only the
+FastAPI route, and reports the time per request. The user is put in the user
+cache beforehand, so no database is needed.
+
+Run from backend-services/auth:
+
+    python -m benchmarks.verify --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import timedelta
+from typing import Dict, List
+
+os.environ.setdefault("USER_DATABASE_URL", "postgresql://localhost/unused")
+os.environ.setdefault("ACCESS_COOKIE_DOMAIN", "crowsnest.mo.ri.se")
+os.environ.setdefault("JWT_TOKEN_SECRET", "benchmark")
+os.environ.setdefault("ADMIN_USER_PASSWORD", "password")
+os.environ.setdefault("BASE_URL", "")
+os.environ.setdefault("USER_CACHE_TTL", "3600")
+os.environ["VERIFY_FAST_PATH"] = "true"
+
+# pylint: disable=wrong-import-position
+from backend import dependencies
+from backend import models
+from backend.main import app
+from backend.routers.verify import verify_request_fast
+
+USERNAME = "benchmark"
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--requests", type=int, default=20000, help="Requests per measurement"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of measurements, the best is kept"
+    )
+    return parser.parse_args(argv)
+
+
+def make_scope(token: str, uri: str) -> dict:
+    """An ASGI scope of a forwardauth request by Traefik"""
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/verify",
+        "raw_path": b"/verify",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"auth"),
+            (b"authorization", f"Bearer {token}".encode()),
+            (b"x-forwarded-host", b"localhost"),
+            (b"x-forwarded-uri", uri.encode()),
+        ],
+        "client": ("127.0.0.1", 12345),
+        "server": ("auth", 80),
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(_message):
+    pass
+
+
+async def measure(scope: dict, requests: int, repeat: int) -> float:
+    """Best time per request in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await app(dict(scope), receive, send)
+        best = min(best, (time.perf_counter() - start) / requests)
+    return best
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Measure allowed and denied requests with and without the fast path"""
+    user = models.UserSnapshot(
+        id=1,
+        username=USERNAME,
+        firstname="Benchmark",
+        lastname="Benchmark",
+        email="benchmark@localhost",
+        admin=False,
+        path_whitelist="/allowed",
+        path_blacklist=None,
+        topic_whitelist=None,
+        topic_blacklist=None,
+        hashed_password=None,
+        token=None,
+    )
+    dependencies.user_cache.set(USERNAME, user)
+    token = dependencies.create_jwt_token(user, timedelta(hours=1))
+    scopes = {
+        "allowed": make_scope(token, "/allowed/page"),
+        "denied": make_scope(token, "/denied/page"),
+    }
+
+    fast_route = next(
+        route
+        for route in app.router.routes
+        if getattr(route, "endpoint", None) is verify_request_fast
+    )
+    position = app.router.routes.index(fast_route)
+    results = {}
+    for name, scope in scopes.items():
+        fast = await measure(scope, args.requests, args.repeat)
+        app.router.routes.remove(fast_route)
+        try:
+            fastapi = await measure(scope, args.requests, args.repeat)
+        finally:
+            app.router.routes.insert(position, fast_route)
+        results[name] = {"fastapi_us": fastapi * 1e6, "fast_path_us": fast * 1e6}
+    return results
+
+
+def main(argv: List[str] = None):
+    """Entry point"""
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    print(f"{'request':<10}{'FastAPI us':>12}{'fast path us':>14}{'saved us':>10}")
+    for name, result in results.items():
+        saved = result["fastapi_us"] - result["fast_path_us"]
+        print(
+            f"{name:<10}{result['fastapi_us']:>12.1f}{result['fast_path_us']:>14.1f}"
+            f"{saved:>10.1f} ({saved / result['fastapi_us']:.0%})"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
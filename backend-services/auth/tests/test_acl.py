@@ -0,0 +1,102 @@
+import re
+
+from hypothesis import given, strategies as st
+
+from backend.acl import (
+    PathACL,
+    PatternMatcher,
+    TopicACL,
+    TopicFilterTrie,
+    UserACL,
+    compile_path_acl,
+)
+from backend.utils import mqtt_match
+
+
+def reference_match(patterns, string):
+    return any(re.match(pattern, string) for pattern in patterns.split(","))
+
+
+def test_pattern_matcher_equals_regex_loop():
+    patterns = "/white,/gis/api,/tiles/[0-9]+,/black$,/a(b)\\1,(?i)/upper"
+    strings = [
+        "/white",
+        "/white/and/more",
+        "/whit",
+        "/gis/api/obstacles",
+        "/tiles/12/3",
+        "/tiles/x",
+        "/black",
+        "/black/",
+        "/abb",
+        "/ab",
+        "/UPPER",
+        "",
+    ]
+    matcher = PatternMatcher(patterns)
+    for string in strings:
+        assert matcher.match(string) == reference_match(patterns, string), string
+
+
+def test_path_acl():
+    # No lists, no restrictions
+    assert PathACL(None, "").allows("/anything")
+
+    # Whitelist only
+    acl = PathACL("/white,/gis", None)
+    assert acl.allows("/white/page")
+    assert acl.allows("/gis/api")
+    assert not acl.allows("/black")
+
+    # Blacklist only
+    acl = PathACL(None, "/black")
+    assert acl.allows("/white")
+    assert not acl.allows("/black/page")
+
+    # Blacklist wins over whitelist
+    acl = PathACL("/white", "/white/secret")
+    assert acl.allows("/white/page")
+    assert not acl.allows("/white/secret")
+
+
+def test_compile_path_acl_is_cached_by_content():
+    assert compile_path_acl("/white", "/black") is compile_path_acl("/white", "/black")
+    assert compile_path_acl("/white", "/black") is not compile_path_acl("/white", None)
+
+
+levels = st.sampled_from(["foo", "bar", "", "+", "#"])
+patterns = st.lists(levels, min_size=1, max_size=5).map("/".join)
+topics = st.lists(levels, min_size=1, max_size=6).map("/".join)
+
+
+@given(st.lists(patterns, min_size=1, max_size=5), topics)
+def test_topic_filter_trie_equals_mqtt_match(pattern_list, topic):
+    trie = TopicFilterTrie(",".join(pattern_list))
+    expected = any(mqtt_match(pattern, topic) for pattern in pattern_list)
+    assert trie.match(topic) == expected
+
+
+def test_topic_acl():
+    acl = TopicACL("any/+/topic/#", None)
+    assert acl.allows("any/trial/topic")
+    assert acl.allows("any/trial/topic/and/more")
+    assert not acl.allows("any/trial/")
+
+    acl = TopicACL(None, "any/+/topic/#")
+    assert acl.allows("something/else/trial/topic")
+    assert not acl.allows("any/trial/topic/")
+
+
+def test_user_acl_claim():
+    user_acl = UserACL(False, "/a,/b", None, "a/#", None)
+    claim = user_acl.claim()
+
+    # Unset lists are left out of the claim
+    assert set(claim) == {"v", "a", "pw", "tw"}
+    assert UserACL.from_claim(claim) == user_acl
+    assert claim["v"] == user_acl.version
+
+    # The version changes with any of the fields
+    assert user_acl._replace(admin=True).version != user_acl.version
+    assert user_acl._replace(path_blacklist="/a").version != user_acl.version
+    assert user_acl._replace(topic_whitelist="b/#").version != user_acl.version
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from backend.bulk import read_csv, read_ndjson, write_csv, write_ndjson
+
+
+async def chunked(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def collect(items):
+    async def main():
+        return [item async for item in items]
+
+    return asyncio.run(main())
+
+
+def test_read_ndjson_across_chunk_boundaries():
+    data = b'{"username": "foo"}\n\n{"username": "bar"}'
+    assert collect(read_ndjson(chunked(data))) == [
+        (1, {"username": "foo"}),
+        (3, {"username": "bar"}),
+    ]
+
+    with pytest.raises(ValueError):
+        collect(read_ndjson(chunked(b'{"username": "foo"}\n[1, 2]\n')))
+
+
+def test_read_csv():
+    data = b"username,path_whitelist\r\nfoo,/white\r\nbar,\r\n"
+    assert collect(read_csv(chunked(data))) == [
+        (2, {"username": "foo", "path_whitelist": "/white"}),
+        (3, {"username": "bar", "path_whitelist": None}),
+    ]
+
+    with pytest.raises(ValueError):
+        collect(read_csv(chunked(b"username,email\nfoo\n")))
+
+
+def test_write():
+    assert write_ndjson([{"id": 1}, {"id": 2}]) == '{"id":1}\n{"id":2}\n'
+    assert write_csv([["id", "username"], [1, "foo"]]) == "id,username\n1,foo\n"
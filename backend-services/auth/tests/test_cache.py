@@ -0,0 +1,69 @@
+import backend.cache
+from backend.cache import TTLCache
+
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Touching 'a' makes 'b' the least recently used entry ...
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    # ... which is evicted when the cache is full
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expiry(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(backend.cache.time, "monotonic", lambda: now)
+
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=20)
+
+    now += 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert "b" in cache
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+
+
+def test_ttl_cache_pop():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    assert cache.pop("a") == 1
+    assert cache.pop("a") is None
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_set_skips_values_read_before_a_removal():
+    cache = TTLCache(maxsize=10, ttl=60)
+    version = cache.version
+    cache.pop("a")
+    cache.set("a", "outdated", version=version)
+    assert cache.get("a") is None
+
+    version = cache.version
+    cache.set("a", "current", version=version)
+    assert cache.get("a") == "current"
+
+
+def test_ttl_cache_pop_where():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("token-1", {"sub": "alice"})
+    cache.set("token-2", {"sub": "bob"})
+    cache.set("token-3", {"sub": "alice"})
+
+    assert cache.pop_where(lambda claims: claims["sub"] == "alice") == 2
+    assert cache.get("token-1") is None
+    assert cache.get("token-3") is None
+    assert cache.get("token-2") == {"sub": "bob"}
@@ -0,0 +1,66 @@
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose.exceptions import JWTError
+
+from backend.keys import KeyRing
+
+
+def private_key_pem(algorithm):
+    if algorithm == "RS256":
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        key = ec.generate_private_key(ec.SECP256R1())
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def test_key_ring_hs256():
+    key_ring = KeyRing("HS256", secret="secret")
+    token = key_ring.encode({"sub": "admin"})
+    assert key_ring.decode(token) == {"sub": "admin"}
+    assert key_ring.jwks() == {"keys": []}
+
+    with pytest.raises(JWTError):
+        KeyRing("HS256", secret="other").decode(token)
+
+
+@pytest.mark.parametrize("algorithm", ["RS256", "ES256"])
+def test_key_ring_rotation(algorithm):
+    old_key = private_key_pem(algorithm)
+    new_key = private_key_pem(algorithm)
+
+    old_ring = KeyRing(algorithm, private_keys=[old_key])
+    old_token = old_ring.encode({"sub": "admin"})
+
+    # Tokens of the old key remain valid after the new key took over ...
+    key_ring = KeyRing(algorithm, private_keys=[new_key, old_key])
+    new_token = key_ring.encode({"sub": "admin"})
+    assert key_ring.decode(old_token) == {"sub": "admin"}
+    assert key_ring.decode(new_token) == {"sub": "admin"}
+
+    # ... until the old key is removed
+    with pytest.raises(JWTError):
+        KeyRing(algorithm, private_keys=[new_key]).decode(old_token)
+    with pytest.raises(JWTError):
+        old_ring.decode(new_token)
+
+    # Both public keys are published, without private members
+    jwks = key_ring.jwks()["keys"]
+    assert [key["alg"] for key in jwks] == [algorithm, algorithm]
+    assert len({key["kid"] for key in jwks}) == 2
+    assert all("d" not in key for key in jwks)
+
+
+def test_key_ring_rejects_missing_keys():
+    with pytest.raises(ValueError):
+        KeyRing("HS256")
+    with pytest.raises(ValueError):
+        KeyRing("RS256")
+    with pytest.raises(ValueError):
+        KeyRing("EdDSA", secret="secret")
+    with pytest.raises(ValueError):
+        KeyRing("RS256", private_keys=[private_key_pem("ES256")])
@@ -0,0 +1,57 @@
+import json
+import logging
+
+from backend.logs import DecisionLog
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(json.loads(record.getMessage()))
+
+
+def test_decision_log_rate_limits_each_event():
+    handler = ListHandler()
+    log = DecisionLog(
+        "test.decisions",
+        logging.INFO,
+        rate=1e-6,
+        burst=2,
+        queue_size=10,
+        handler=handler,
+    )
+    log.start()
+    for _ in range(5):
+        log.log(logging.INFO, "expired_token")
+    log.log(logging.WARNING, "wrong_password", username="admin")
+    log.log(logging.DEBUG, "ignored")
+    log.stop()
+
+    assert handler.messages == [
+        {"event": "expired_token"},
+        {"event": "expired_token"},
+        {"event": "wrong_password", "username": "admin"},
+    ]
+    stats = log.stats()
+    assert stats["logged"] == 3
+    assert stats["suppressed"] == 3
+    assert stats["dropped"] == 0
+    assert stats["seconds"] > 0
+
+
+def test_decision_log_drops_events_when_queue_is_full():
+    handler = ListHandler()
+    log = DecisionLog(
+        "test.dropped", logging.INFO, rate=1, burst=10, queue_size=2, handler=handler
+    )
+    # Not started, so nothing is taken off the queue
+    log.logger.addHandler(log._handler)
+    log.logger.propagate = False
+    for index in range(3):
+        log.log(logging.INFO, f"event_{index}")
+
+    assert log.stats()["queued"] == 2
+    assert log.stats()["dropped"] == 1
@@ -0,0 +1,36 @@
+import asyncio
+from types import SimpleNamespace
+
+from backend.metrics import MetricsMiddleware, REQUEST_SECONDS, observe_query
+
+
+async def endpoint():
+    pass
+
+
+def test_metrics_middleware_labels_by_route_and_counts_queries():
+    async def app(scope, receive, send):
+        scope["endpoint"] = endpoint
+        observe_query(0.01)
+        observe_query(0.02)
+
+    routes = [SimpleNamespace(endpoint=endpoint, path="/test/{idx}")]
+    middleware = MetricsMiddleware(app, routes=lambda: routes)
+    asyncio.run(middleware({"type": "http"}, None, None))
+
+    queries = middleware._children_for(endpoint)[1]
+    assert REQUEST_SECONDS.labels("/test/{idx}")._sum.get() > 0
+    assert queries._sum.get() == 2
+
+    # Queries outside of a request are ignored
+    observe_query(0.01)
+    assert queries._sum.get() == 2
+
+
+def test_metrics_are_not_served_through_a_proxy(offline_client):
+    response = offline_client.get("/metrics")
+    assert response.status_code == 200
+    assert "auth_request_duration_seconds" in response.text
+
+    response = offline_client.get("/metrics", headers={"X-Forwarded-For": "10.0.0.1"})
+    assert response.status_code == 404
@@ -0,0 +1,31 @@
+import json
+
+from benchmarks import micro
+
+
+def test_benchmarks_run():
+    names = set()
+    for name, function in micro.benchmarks():
+        function()
+        names.add(name)
+
+    # Every benchmark but the references has a stored baseline
+    baselines = set(json.loads(micro.BASELINES.read_text())["benchmarks"])
+    assert names - micro.REFERENCE_BENCHMARKS == baselines
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    results = {
+        "fast": {"ns": 100, "relative": 1.0},
+        "slower": {"ns": 140, "relative": 1.4},
+        "regressed": {"ns": 200, "relative": 2.0},
+        "new": {"ns": 200, "relative": 2.0},
+    }
+    baselines = {"fast": 1.0, "slower": 1.0, "regressed": 1.0}
+    assert micro.compare(results, baselines, 1.5) == ["regressed"]
+
+
+def test_compare_ignores_reference_benchmarks():
+    name = next(iter(micro.REFERENCE_BENCHMARKS))
+    results = {name: {"ns": 200, "relative": 2.0}}
+    assert micro.compare(results, {name: 1.0}, 1.5) == []
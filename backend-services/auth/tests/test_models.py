@@ -0,0 +1,23 @@
+import pytest
+
+from backend import schemas
+from backend.acl import UserACL
+from backend.models import User, UserSnapshot
+
+from benchmarks.micro import USER_RECORD
+
+
+def test_user_snapshot_from_record():
+    user = UserSnapshot.from_record(USER_RECORD)
+    orm_user = User.from_record(USER_RECORD)
+
+    for name in UserSnapshot._fields:
+        assert getattr(user, name) == getattr(orm_user, name)
+
+    # Serialized and checked against ACLs just like the ORM model
+    assert schemas.UserOut.from_orm(user) == schemas.UserOut.from_orm(orm_user)
+    assert UserACL.of(user) == UserACL.of(orm_user)
+
+    # Immutable, so that it can be shared through the caches
+    with pytest.raises(AttributeError):
+        user.admin = True
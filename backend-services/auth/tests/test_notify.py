@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import backend.notify
+from backend.notify import ChangeListener
+
+
+class FakeConnection:
+    def __init__(self):
+        self.listeners = {}
+        self.termination_listeners = []
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def notify(self, channel, payload):
+        self.listeners[channel](self, 1234, channel, payload)
+
+    def terminate(self):
+        self.closed = True
+        for callback in self.termination_listeners:
+            callback(self)
+
+    async def close(self):
+        self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+
+def test_change_listener(monkeypatch):
+    connections = []
+
+    async def connect(_url):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(backend.notify.asyncpg, "connect", connect)
+    changes = []
+    resets = []
+    listener = ChangeListener(
+        "postgresql://",
+        "changes",
+        on_change=changes.append,
+        on_reset=lambda: resets.append(True),
+        retry_interval=0,
+    )
+
+    async def main():
+        listener.start()
+        await asyncio.sleep(0)
+
+        # Caches are reset once connected, changes may have been missed before
+        assert len(resets) == 1
+        assert listener.stats()["connected"] == 1
+
+        connections[0].notify("changes", '{"username": "alice"}')
+        connections[0].notify("changes", '{"username": null}')
+        assert changes == ["alice", None]
+
+        # Malformed notifications reset the caches, as do truncations
+        connections[0].notify("changes", "alice")
+        assert len(resets) == 2
+        connections[0].notify("changes", '{"reset": true}')
+        assert len(resets) == 3
+        assert changes == ["alice", None]
+
+        # And so does reconnecting after the connection was lost
+        connections[0].terminate()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert len(connections) == 2
+        assert len(resets) == 4
+
+        await listener.stop()
+        assert connections[1].closed
+
+    asyncio.run(main())
+    assert listener.stats()["notifications"] == 4
+
+
+def test_changes_made_with_sql_are_published(service, client, bearer):
+    admin = bearer("admin")
+    username = "sql-changed"
+    response = client.post(
+        "/users",
+        json={
+            "username": username,
+            "firstname": "Sql",
+            "lastname": "Changed",
+            "email": "sql-changed@test",
+            "password": "password",
+            "admin": False,
+            "topic_whitelist": "/before/#",
+        },
+        headers=admin,
+    )
+    assert response.status_code == 200
+
+    def verify(topic):
+        params = {"username": username, "topic": topic}
+        return client.get("/verify_emqx", params=params).status_code
+
+    try:
+        assert verify("/before/topic") == 200
+        assert username in service.user_cache
+
+        # Written behind the back of the service, as by an administrator
+        update = service.models.users.update().where(
+            service.models.User.username == username
+        )
+        client.portal.call(
+            service.database.execute, update.values(topic_whitelist="/after/#")
+        )
+        deadline = time.monotonic() + 5
+        while username in service.user_cache and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert verify("/before/topic") == 403
+        assert verify("/after/topic") == 200
+    finally:
+        users = client.get(
+            "/users", params={"email": "sql-changed@test"}, headers=admin
+        ).json()
+        client.delete(f"/users/{users[0]['id']}", headers=admin)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from backend.exceptions import OverloadedException
+from backend.passwords import PasswordHasher
+
+
+def test_password_hasher_hash_and_verify():
+    hasher = PasswordHasher(workers=1, queue_limit=4)
+
+    async def main():
+        hashed_password = await hasher.hash("password")
+        assert await hasher.verify("password", hashed_password)
+        assert not await hasher.verify("wrong", hashed_password)
+
+    asyncio.run(main())
+    hasher.shutdown()
+
+
+def test_password_hasher_keeps_event_loop_responsive():
+    hasher = PasswordHasher(workers=1, queue_limit=4)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    async def main():
+        task = asyncio.create_task(ticker())
+        await hasher.hash("password")
+        task.cancel()
+
+    asyncio.run(main())
+    hasher.shutdown()
+
+    # The event loop kept running while bcrypt was hashing
+    assert ticks > 1
+
+
+def test_password_hasher_rejects_beyond_queue_limit():
+    hasher = PasswordHasher(workers=1, queue_limit=1)
+
+    async def main():
+        first = asyncio.create_task(hasher.hash("password"))
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedException):
+            await hasher.hash("password")
+        await first
+
+    asyncio.run(main())
+    hasher.shutdown()
+
+
+def test_password_hasher_restarts_after_shutdown():
+    hasher = PasswordHasher(workers=1, queue_limit=4)
+    hasher.start()
+    hasher.shutdown()
+
+    async def main():
+        return await hasher.hash("password")
+
+    assert hasher.context.verify("password", asyncio.run(main()))
+    hasher.shutdown()
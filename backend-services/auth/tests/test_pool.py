@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from backend.exceptions import OverloadedException
+from backend.pool import PoolMonitor
+
+
+class FakePool:
+    def __init__(self, size):
+        self.idle = asyncio.Queue()
+        for index in range(size):
+            self.idle.put_nowait(f"connection {index}")
+        self.size = size
+
+    async def acquire(self, timeout=None):
+        return await asyncio.wait_for(self.idle.get(), timeout)
+
+    async def release(self, connection):
+        self.idle.put_nowait(connection)
+
+    def get_size(self):
+        return self.size
+
+    def get_idle_size(self):
+        return self.idle.qsize()
+
+    def get_min_size(self):
+        return self.size
+
+    def get_max_size(self):
+        return self.size
+
+
+class FakeBackend:
+    def __init__(self, pool):
+        self._pool = pool
+
+
+class FakeDatabase:
+    def __init__(self, pool):
+        self._backend = FakeBackend(pool)
+
+
+def test_pool_monitor():
+    monitor = PoolMonitor(acquire_timeout=0.05)
+
+    async def main():
+        database = FakeDatabase(FakePool(1))
+        monitor.instrument(database)
+        pool = database._backend._pool
+
+        connection = await pool.acquire()
+        assert monitor.stats()["in_use"] == 1
+
+        # The pool is exhausted ...
+        with pytest.raises(OverloadedException):
+            await pool.acquire()
+
+        # ... until the connection is released through the proxy
+        await pool.release(connection)
+        assert await pool.acquire() == connection
+
+    asyncio.run(main())
+
+    stats = monitor.stats()
+    assert stats["acquisitions"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["waiting"] == 0
+    assert stats["wait_seconds_max"] >= 0.05
@@ -0,0 +1,45 @@
+import asyncio
+
+from backend.profiling import Profiler, ProfilerMiddleware, observe_phase
+
+
+class Route:
+    path = "/verify"
+
+    @staticmethod
+    async def endpoint(scope, receive, send):
+        observe_phase("db", 0.001)
+        observe_phase("db", 0.002)
+        observe_phase("jwt", 0.0005)
+
+
+def test_profiler_samples_requests_during_window():
+    profiler = Profiler()
+
+    async def app(scope, receive, send):
+        scope["endpoint"] = Route.endpoint
+        await Route.endpoint(scope, receive, send)
+
+    middleware = ProfilerMiddleware(app, profiler, routes=lambda: [Route])
+
+    async def requests(count):
+        for _ in range(count):
+            await middleware({"type": "http"}, None, None)
+
+    # Nothing is recorded outside of a profiling window
+    asyncio.run(requests(2))
+    observe_phase("db", 1)
+    assert profiler.collapsed() == ""
+
+    profiler.start(duration=60, every=2)
+    asyncio.run(requests(4))
+    assert profiler.stats() == {"active": 1, "requests": 4, "samples": 2}
+
+    stacks = dict(line.rsplit(" ", 1) for line in profiler.collapsed().splitlines())
+    assert stacks.keys() == {"/verify;db", "/verify;jwt", "/verify;framework"}
+    assert stacks["/verify;db"] == "6000"
+    assert stacks["/verify;jwt"] == "1000"
+
+    profiler.stop()
+    asyncio.run(requests(2))
+    assert profiler.stats()["samples"] == 2
@@ -0,0 +1,81 @@
+import pytest
+
+import backend.ratelimit
+from backend.exceptions import OverloadedException
+from backend.ratelimit import ConcurrencyLimiter, TokenBucketLimiter
+
+
+def test_token_bucket_limiter(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(backend.ratelimit.time, "monotonic", lambda: now)
+
+    limiter = TokenBucketLimiter(rate=0.5, burst=2, maxsize=2)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+
+    # The burst is used up, a token is back in 2 s
+    assert limiter.acquire("a") == pytest.approx(2)
+    assert limiter.acquire("b") == 0
+
+    now += 1
+    assert limiter.acquire("a") == pytest.approx(1)
+    now += 1
+    assert limiter.acquire("a") == 0
+
+    # Evicted buckets start over full
+    assert limiter.acquire("c") == 0
+    assert limiter.stats() == {"size": 2, "rejections": 2, "evictions": 1}
+    assert limiter.acquire("b") == 0
+    assert limiter.acquire("b") == 0
+
+
+def test_token_bucket_limiter_check(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(backend.ratelimit.time, "monotonic", lambda: now)
+
+    limiter = TokenBucketLimiter(rate=0.5, burst=1, maxsize=2)
+    # Checks take no tokens
+    assert limiter.check("a") == 0
+    assert limiter.check("a") == 0
+    assert limiter.acquire("a") == 0
+    assert limiter.check("a") == pytest.approx(2)
+    now += 1
+    assert limiter.check("a") == pytest.approx(1)
+    assert limiter.stats()["rejections"] == 2
+
+
+def login(client, username, password):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def test_login_rate_limits(client, monkeypatch):
+    import backend.main
+
+    client_limiter = TokenBucketLimiter(rate=1e-6, burst=4, maxsize=8)
+    username_limiter = TokenBucketLimiter(rate=1e-6, burst=1, maxsize=8)
+    monkeypatch.setattr(backend.main, "client_login_limiter", client_limiter)
+    monkeypatch.setattr(backend.main, "username_login_limiter", username_limiter)
+
+    # Successful logins do not count against the username
+    assert login(client, "admin", "password").status_code == 200
+    assert login(client, "admin", "password").status_code == 200
+
+    # Failed ones do, and attempts rejected by the username limit do not
+    # count against the client
+    assert login(client, "nobody", "password").status_code == 401
+    response = login(client, "nobody", "password")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+    assert login(client, "admin", "password").status_code == 200
+    assert login(client, "admin", "password").status_code == 429
+
+
+def test_concurrency_limiter():
+    limiter = ConcurrencyLimiter(limit=1)
+    with limiter.slot():
+        with pytest.raises(OverloadedException):
+            with limiter.slot():
+                pass
+    with limiter.slot():
+        assert limiter.stats() == {"active": 1, "rejections": 1}
@@ -0,0 +1,37 @@
+from starlette.responses import JSONResponse
+
+import backend.responses
+from backend.responses import FastJSONResponse, dumps, etag_matches, record_dict
+
+CONTENT = {
+    "detail": "Åtkomst nekad",
+    "users": [{"id": 1, "admin": True, "path_whitelist": None, "ratio": 0.5}],
+    "count": 1,
+}
+
+
+def test_fast_json_response_matches_json_response(monkeypatch):
+    expected = JSONResponse(CONTENT).body
+    assert FastJSONResponse(CONTENT).body == expected
+    assert FastJSONResponse(CONTENT).headers == JSONResponse(CONTENT).headers
+
+    # The same without orjson
+    monkeypatch.setattr(backend.responses, "orjson", None)
+    assert dumps(CONTENT) == expected
+
+
+def test_record_dict():
+    class Record(dict):
+        _mapping = {"id": 1, "username": "admin"}
+
+    assert record_dict(Record()) == {"id": 1, "username": "admin"}
+    assert record_dict({"id": 2}) == {"id": 2}
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"xyz", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches('"xyz"', '"abc"')
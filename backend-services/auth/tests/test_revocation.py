@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from backend.revocation import BloomFilter, RevocationList
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"token-{index}" for index in range(1000)]
+    for item in items:
+        bloom_filter.add(item)
+
+    assert all(item in bloom_filter for item in items)
+    assert bloom_filter.count == 1000
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    for index in range(1000):
+        bloom_filter.add(f"token-{index}")
+
+    false_positives = sum(f"other-{index}" in bloom_filter for index in range(10000))
+    assert false_positives < 200
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.revoked = set()
+        self.lookups = 0
+
+    async def fetch_val(self, query):
+        self.lookups += 1
+        jti = query.compile().params["jti_1"]
+        return jti if jti in self.revoked else None
+
+    async def fetch_all(self, query):
+        return [{"jti": jti} for jti in self.revoked]
+
+    async def execute(self, query):
+        pass
+
+
+def test_false_positives_are_looked_up_once():
+    database = FakeDatabase()
+    revocation_list = RevocationList(
+        database, capacity=1000, error_rate=0.01, sync_interval=10
+    )
+    revocation_list.filter.add("token")
+
+    async def is_revoked():
+        return await revocation_list.is_revoked("token", time.time() + 60)
+
+    assert not asyncio.run(is_revoked())
+    assert not asyncio.run(is_revoked())
+    assert database.lookups == 1
+    assert revocation_list.stats()["false_positives"] == 1
+
+    # Revoked through another replica, picked up by the next sync
+    database.revoked.add("token")
+    asyncio.run(revocation_list.sync())
+    assert asyncio.run(is_revoked())
+    assert database.lookups == 2
+
+
+def test_revoked_false_positives_are_forgotten():
+    database = FakeDatabase()
+    revocation_list = RevocationList(
+        database, capacity=1000, error_rate=0.01, sync_interval=10
+    )
+    revocation_list.filter.add("token")
+    assert not asyncio.run(revocation_list.is_revoked("token", time.time() + 60))
+
+    asyncio.run(revocation_list.revoke("token", None))
+    database.revoked.add("token")
+    assert asyncio.run(revocation_list.is_revoked("token", time.time() + 60))
@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from backend.acl import UserACL
+
+
+@pytest.fixture
+def stateless(service, monkeypatch):
+    monkeypatch.setattr(service, "STATELESS_VERIFY", True)
+    yield
+    service.evict_all_users()
+
+
+def verify(client, headers, uri):
+    headers = {**headers, "X-Forwarded-Host": "localhost", "X-Forwarded-Uri": uri}
+    return client.get("/verify", headers=headers, allow_redirects=False)
+
+
+def test_verify_without_database_access(
+    service, stateless, offline_client, bearer, user
+):
+    service.acl_version_cache.set(user.username, UserACL.of(user).version)
+    headers = bearer(user)
+
+    # The user is in no cache, the ACL claim of the token decides
+    assert verify(offline_client, headers, "/gis/page").status_code == 200
+    assert verify(offline_client, headers, "/api/other").status_code == 401
+    assert verify(offline_client, headers, "/admin/page").status_code == 307
+
+
+def test_tampered_acl_claim_is_rejected(
+    service, stateless, offline_client, bearer, user
+):
+    service.acl_version_cache.set(user.username, UserACL.of(user).version)
+    header, payload, signature = bearer(user)["Authorization"].split()[1].split(".")
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    claims["acl"]["pw"] = "/api/.*"
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode()
+    token = ".".join((header, payload.rstrip("="), signature))
+
+    response = verify(offline_client, {"Authorization": f"Bearer {token}"}, "/api/x")
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid token"
+
+
+def test_missing_or_outdated_acl_claim_falls_back_to_the_user(service, stateless, user):
+    service.user_cache.set(user.username, user)
+    current = UserACL.of(user)
+
+    async def fetch(claims):
+        return await service.fetch_user_acl(claims)
+
+    # No ACL claim, e.g. a token issued before stateless verify was enabled
+    assert asyncio.run(fetch({"sub": user.username})) == current
+
+    # An ACL claim of another version of the ACL
+    outdated = UserACL.of(user._replace(path_whitelist="/.*")).claim()
+    assert asyncio.run(fetch({"sub": user.username, "acl": outdated})) == current
+
+    # The fallback lookup records the current version, so the claim of a
+    # current token is used from now on
+    assert service.acl_version_cache.get(user.username) == current.version
+    claim = {**current.claim(), "pw": "/claimed/.*"}
+    assert asyncio.run(fetch({"sub": user.username, "acl": claim})).path_whitelist == (
+        "/claimed/.*"
+    )
+
+
+def test_modified_acl_falls_back_to_the_database(
+    service, stateless, client, bearer, user
+):
+    admin = bearer("admin")
+    response = client.post(
+        "/users",
+        json={
+            "username": user.username,
+            "firstname": user.firstname,
+            "lastname": user.lastname,
+            "email": user.email,
+            "password": "password",
+            "admin": False,
+            "path_whitelist": user.path_whitelist,
+        },
+        headers=admin,
+    )
+    assert response.status_code == 200
+    users = client.get("/users", params={"email": user.email}, headers=admin).json()
+    idx = users[0]["id"]
+    try:
+        service.acl_version_cache.set(user.username, UserACL.of(user).version)
+        headers = bearer(user)
+        assert verify(client, headers, "/gis/page").status_code == 200
+
+        response = client.put(
+            f"/users/{idx}", json={"path_whitelist": "/new/.*"}, headers=admin
+        )
+        assert response.status_code == 200
+
+        # The token's ACL digest is outdated, the user is fetched instead
+        assert verify(client, headers, "/gis/page").status_code == 307
+        assert verify(client, headers, "/new/page").status_code == 200
+    finally:
+        client.delete(f"/users/{idx}", headers=admin)
@@ -0,0 +1,39 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+from jose.exceptions import ExpiredSignatureError
+
+
+def test_cached_claims_are_not_served_past_exp(service, user):
+    token = service.create_jwt_token(user, timedelta(seconds=2))
+    exp = asyncio.run(service.decode_token(token))["exp"]
+
+    # Served from the token cache while the token is valid ...
+    hits = service.token_cache.hits
+    assert asyncio.run(service.decode_token(token))["sub"] == user.username
+    assert service.token_cache.hits == hits + 1
+
+    # ... but not once it has expired
+    time.sleep(max(exp + 1 - time.time(), 0))
+    with pytest.raises(ExpiredSignatureError):
+        asyncio.run(service.decode_token(token))
+    assert token not in service.token_cache
+
+
+def test_cached_claims_are_dropped_when_the_user_is_evicted(service, user):
+    token = service.create_jwt_token(user, timedelta(minutes=5))
+    other = service.create_jwt_token(user._replace(username="other"))
+    asyncio.run(service.decode_token(token))
+    asyncio.run(service.decode_token(other))
+    assert token in service.token_cache
+
+    service.evict_user(user.username)
+    assert token not in service.token_cache
+    assert other in service.token_cache
+
+    # The token is verified again on its next use
+    misses = service.token_cache.misses
+    assert asyncio.run(service.decode_token(token))["sub"] == user.username
+    assert service.token_cache.misses == misses + 1
@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+from backend.utils import encode_cursor
+
+LASTNAME = "Pagination"
+# bcrypt hash of "password"
+HASHED_PASSWORD = "$2b$04$PKfFbqEwsQ6ZeAh4Sgju/uOf2WjZ.IL.jhnPDuP6Wouw1zR4vKOZC"
+
+
+@pytest.fixture
+def admin(bearer):
+    return bearer("admin")
+
+
+@pytest.fixture
+def users(client, admin):
+    """Five users sharing a last name, with firstnames in reverse order of
+    their ids and two distinct emails"""
+    lines = [
+        json.dumps(
+            {
+                "username": f"pagination-{index}",
+                "firstname": f"First {5 - index}",
+                "lastname": LASTNAME,
+                "email": f"group-{index % 2}@pagination.test",
+                "admin": False,
+                "hashed_password": HASHED_PASSWORD,
+                "topic_whitelist": f"/topic/{index}" if index % 2 else None,
+            }
+        )
+        for index in range(5)
+    ]
+    response = client.post(
+        "/users/import",
+        data="\n".join(lines),
+        headers={**admin, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    records = list_users(client, admin, _sort="id").json()
+    yield records
+    for record in records:
+        client.delete(f"/users/{record['id']}", headers=admin)
+
+
+def list_users(client, admin, **params):
+    return client.get("/users", params={"lastname": LASTNAME, **params}, headers=admin)
+
+
+def test_pages_follow_the_next_cursor(client, admin, users):
+    pages = []
+    response = list_users(client, admin, _sort="firstname", _start=0, _end=2)
+    while True:
+        assert response.status_code == 200
+        assert response.headers["x-total-count"] == "5"
+        pages.append([user["firstname"] for user in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+        response = list_users(
+            client, admin, _sort="firstname", _start=0, _end=2, _cursor=cursor
+        )
+
+    assert pages == [["First 1", "First 2"], ["First 3", "First 4"], ["First 5"]]
+
+
+def test_pages_in_descending_order(client, admin, users):
+    response = list_users(client, admin, _sort="id", _order="DESC", _end=3)
+    first = [user["id"] for user in response.json()]
+    cursor = response.headers["x-next-cursor"]
+    response = list_users(
+        client, admin, _sort="id", _order="desc", _end=3, _cursor=cursor
+    )
+    second = [user["id"] for user in response.json()]
+
+    ids = sorted((user["id"] for user in users), reverse=True)
+    assert first + second == ids
+    assert "x-next-cursor" not in response.headers
+
+
+def test_filters_and_total_count(client, admin, users):
+    response = list_users(client, admin, email="group-0@pagination.test", _end=1)
+    assert response.headers["x-total-count"] == "3"
+    assert len(response.json()) == 1
+
+    response = list_users(client, admin, email="nobody@pagination.test")
+    assert response.headers["x-total-count"] == "0"
+    assert response.json() == []
+
+
+def test_acl_columns_are_sorted_by_offset(client, admin, users):
+    response = list_users(client, admin, _sort="topic_whitelist", _start=0, _end=2)
+    assert response.status_code == 200
+    assert [user["topic_whitelist"] for user in response.json()] == [
+        "/topic/1",
+        "/topic/3",
+    ]
+    assert "x-next-cursor" not in response.headers
+
+    response = list_users(client, admin, _sort="topic_whitelist", _start=2, _end=5)
+    assert [user["topic_whitelist"] for user in response.json()] == [None] * 3
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"_sort": "hashed_password"},
+        {"_sort": "id; DROP TABLE users"},
+        {"_order": "sideways"},
+        {"_cursor": "not a cursor"},
+        {"_cursor": encode_cursor([1])},
+        {"_cursor": encode_cursor(["1", 1])},
+        {"_sort": "username", "_cursor": encode_cursor(["name", "1"])},
+        {"_sort": "admin", "_cursor": encode_cursor([0, 1])},
+        {"_sort": "topic_whitelist", "_cursor": encode_cursor(["/topic", 1])},
+    ],
+)
+def test_invalid_listings_are_rejected(client, admin, params):
+    assert list_users(client, admin, **params).status_code == 422
+
+
+@pytest.mark.parametrize("path", ["/me", "/users/{id}"])
+def test_user_etags(client, admin, bearer, users, path):
+    user = users[0]
+    headers = bearer(user["username"]) if path == "/me" else admin
+    url = path.format(**user)
+
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}'):
+        response = client.get(url, headers={**headers, "If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+    response = client.put(
+        f"/users/{user['id']}", json={"firstname": "Modified"}, headers=admin
+    )
+    assert response.status_code == 200
+
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["firstname"] == "Modified"
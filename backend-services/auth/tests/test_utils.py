@@ -1,4 +1,13 @@
-from backend.utils import mqtt_match
+import pytest
+
+from backend.utils import (
+    mqtt_match,
+    encode_cursor,
+    decode_cursor,
+    looks_like_jwt,
+    validate_paths_text_string,
+)
+from jose import jwt
 
 
 def test_mqtt_topic_match():
@@ -29,3 +38,43 @@ def test_mqtt_topic_match():
     # Wildcard ALL and SINGLE
     assert mqtt_match("foo/+/baz", "foo/bar/baz")
     assert mqtt_match("foo/+/#", "foo/bar/baz")
+
+
+def test_pagination_cursor_round_trip():
+    cursor = encode_cursor(["Administrator", 1])
+    assert decode_cursor(cursor, (str, int)) == ["Administrator", 1]
+    assert decode_cursor(encode_cursor([True, 1]), (bool, int)) == [True, 1]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        encode_cursor({"a": 1}),
+        encode_cursor(["Administrator"]),
+        encode_cursor(["Administrator", 1, 2]),
+        encode_cursor([1, 1]),
+        encode_cursor(["Administrator", "1"]),
+        encode_cursor(["Administrator", True]),
+        encode_cursor(["Administrator", [1]]),
+        encode_cursor(["Administrator", None]),
+    ],
+)
+def test_malformed_pagination_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, (str, int))
+
+
+def test_validate_paths_text_string():
+    assert validate_paths_text_string("")
+    assert validate_paths_text_string("/foo")
+    assert validate_paths_text_string("/foo/bar,/baz")
+    assert not validate_paths_text_string("foo")
+    assert not validate_paths_text_string("/foo,bar")
+
+
+def test_looks_like_jwt():
+    assert looks_like_jwt(jwt.encode({"sub": "admin"}, "secret"))
+    assert not looks_like_jwt("admin")
+    assert not looks_like_jwt("first.last")
+    assert not looks_like_jwt("eyJ.eyJ.")
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from backend.schemas import VERIFY_BATCH_MAX_ITEMS
+
+
+def test_verify_batch_for_a_token(service, offline_client, bearer, user):
+    service.user_cache.set(user.username, user)
+    token = bearer(user)["Authorization"].split()[1]
+
+    response = offline_client.post(
+        "/verify_batch",
+        json={
+            "token": token,
+            "topics": ["/vessel/gnss", "/vessel/secret", "/other/gnss"],
+            "uris": ["/gis/api", "/admin/users", "/other"],
+        },
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "topics": [True, False, False],
+        "uris": [True, False, False],
+    }
+
+
+def test_verify_batch_for_a_username(service, offline_client, user):
+    service.user_cache.set(user.username, user)
+
+    response = offline_client.post(
+        "/verify_batch",
+        json={"username": user.username, "topics": ["/vessel/gnss", "/other"]},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"topics": [True, False], "uris": []}
+
+
+def test_verify_batch_rejects_uris_for_a_username(service, offline_client, user):
+    service.user_cache.set(user.username, user)
+
+    response = offline_client.post(
+        "/verify_batch", json={"username": user.username, "uris": ["/gis/api"]}
+    )
+    assert response.status_code == 422
+
+
+def test_verify_batch_rejects_invalid_requests(offline_client, bearer, user):
+    token = bearer(user)["Authorization"].split()[1]
+    too_many = ["/vessel/gnss"] * (VERIFY_BATCH_MAX_ITEMS + 1)
+
+    for body in (
+        {"topics": ["/vessel/gnss"]},
+        {"username": user.username, "token": token, "topics": ["/vessel/gnss"]},
+        {"token": token, "topics": too_many},
+        {"token": token, "uris": too_many},
+    ):
+        assert offline_client.post("/verify_batch", json=body).status_code == 422
+
+    response = offline_client.post(
+        "/verify_batch", json={"token": "invalid", "topics": ["/vessel/gnss"]}
+    )
+    assert response.status_code == 401
+
+
+def verify_emqx(client, username, topic="/vessel/gnss"):
+    return client.get("/verify_emqx", params={"username": username, "topic": topic})
+
+
+def test_verify_emqx_with_a_token_as_username(service, offline_client, bearer, user):
+    service.user_cache.set(user.username, user)
+    token = bearer(user)["Authorization"].split()[1]
+
+    # The token is verified without a lookup of it as a username
+    assert verify_emqx(offline_client, token).status_code == 200
+    assert verify_emqx(offline_client, token, "/vessel/secret").status_code == 403
+
+
+def test_verify_emqx_with_an_invalid_token_as_username(client, bearer, user):
+    token = bearer(user)["Authorization"].split()[1]
+    header, payload, _ = token.split(".")
+
+    # Looked up as a username, of which there is none
+    assert verify_emqx(client, f"{header}.{payload}.invalid").status_code == 401
+    expired = bearer(user, exp=timedelta(minutes=-1))["Authorization"].split()[1]
+    assert verify_emqx(client, expired).status_code == 401
+
+
+def test_verify_emqx_remembers_unknown_users(service, client, bearer, monkeypatch):
+    username = "unknown-vessel"
+    queries = []
+    fetch_one = service.database.fetch_one
+
+    async def counting_fetch_one(*args, **kwargs):
+        queries.append(args)
+        return await fetch_one(*args, **kwargs)
+
+    monkeypatch.setattr(service.database, "fetch_one", counting_fetch_one)
+    assert verify_emqx(client, username).status_code == 401
+    assert verify_emqx(client, username).status_code == 401
+    assert len(queries) == 1
+
+    # Forgotten once the user is created
+    admin = bearer("admin")
+    response = client.post(
+        "/users",
+        json={
+            "username": username,
+            "firstname": "Unknown",
+            "lastname": "Vessel",
+            "email": "unknown-vessel@test",
+            "password": "password",
+            "admin": False,
+            "topic_whitelist": "/vessel/#",
+        },
+        headers=admin,
+    )
+    assert response.status_code == 200
+    try:
+        assert verify_emqx(client, username).status_code == 200
+    finally:
+        users = client.get(
+            "/users", params={"email": "unknown-vessel@test"}, headers=admin
+        ).json()
+        client.delete(f"/users/{users[0]['id']}", headers=admin)
@@ -13,78 +13,309 @@ BEGIN
 END
 $$;
 
+-- Version of the chart data, incremented by every change of the chart tables
+-- read by get_obstacles, see attach_chart_triggers below. It is updated in
+-- the transaction changing the data, so the two are seen together.
+CREATE TABLE IF NOT EXISTS public.chart_version (version bigint NOT NULL);
+INSERT INTO public.chart_version (version)
+    SELECT 0 WHERE NOT EXISTS (SELECT FROM public.chart_version);
+
+-- Cache of the obstacles found by get_obstacles, per block of grid cells, draft,
+-- chart and version of the chart data. Entries of older versions are never
+-- read again and are deleted by expire_obstacle_cache below. The cache is
+-- disposable, so it is recreated with this script.
+DROP TABLE IF EXISTS public.obstacle_cache_expiry;
+DROP TABLE IF EXISTS public.obstacle_cache;
+CREATE UNLOGGED TABLE public.obstacle_cache (
+    block_key text NOT NULL,
+    draft numeric NOT NULL,
+    chart text NOT NULL,
+    version bigint NOT NULL,
+    obstacles geometry[] NOT NULL,
+    created timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (block_key, draft, chart, version)
+);
+REVOKE ALL ON public.obstacle_cache FROM web_anon;
+
+-- Time of the last expiry of the cache by get_obstacles, see below
+CREATE UNLOGGED TABLE public.obstacle_cache_expiry (expired timestamptz NOT NULL);
+INSERT INTO public.obstacle_cache_expiry (expired) VALUES ('-infinity');
+REVOKE ALL ON public.obstacle_cache_expiry FROM web_anon;
+
 -- Functions to access GIS data
 CREATE OR REPLACE FUNCTION public.get_obstacles(params json) RETURNS json
-    LANGUAGE sql
+    LANGUAGE plpgsql
+    SECURITY DEFINER
+    SET search_path = public, pg_temp
     AS $_$
-        WITH chart AS (           
-        SELECT 
-            name, scale
+    DECLARE
+        -- The obstacles of an area are looked up in the block of grid cells
+        -- covering it and then clipped to the area, so that the views of a
+        -- panning or zooming client share the lookup of their block. Cells
+        -- are 0.01 degrees, about 1 km.
+        _cell CONSTANT float8 := 0.01;
+        _area geometry := ST_GeomFromGeoJSON(params->>'area_geom');
+        _draft numeric := (params->>'draft')::numeric;
+        _version bigint;
+        _chart text;
+        _block geometry;
+        _block_key text;
+        _obstacles geometry[];
+    BEGIN
+        -- Read before the chart data, so that obstacles found in data newer
+        -- than this version are cached under an outdated key, never the reverse
+        SELECT version INTO _version FROM chart_version;
+
+        SELECT
+            name INTO _chart
         FROM
             m_covr
         WHERE
-            ST_Covers(
-                geom,
-                ST_GeomFromGeoJSON(params->>'area_geom')
-            )
-        ORDER BY 
+            ST_Covers(geom, _area)
+        ORDER BY
             scale
-        LIMIT 1
-    )
-    SELECT CASE
-        WHEN
-            (SELECT count(chart.name) FROM chart) < 1
-        THEN
-            '{"message": "Analyzed area not entirely within a chart."}'::json
-        ELSE (
-            SELECT ( 
-                SELECT
-                    (ST_AsGeoJSON(t.*)::json)
-                FROM (
-                    VALUES (
-                        ST_Collect(ST_Intersection(obstacles.geom::geometry,ST_GeomFromGeoJSON(params->>'area_geom')))
-                    )
-                ) AS t(geom)
-            )
+        LIMIT 1;
+
+        IF _chart IS NULL THEN
+            RETURN '{"message": "Analyzed area not entirely within a chart."}'::json;
+        END IF;
+
+        _block := ST_MakeEnvelope(
+            floor(ST_XMin(_area) / _cell) * _cell,
+            floor(ST_YMin(_area) / _cell) * _cell,
+            ceil(ST_XMax(_area) / _cell) * _cell,
+            ceil(ST_YMax(_area) / _cell) * _cell,
+            ST_SRID(_area)
+        );
+        _block_key := concat_ws(
+            ',',
+            floor(ST_XMin(_area) / _cell),
+            floor(ST_YMin(_area) / _cell),
+            ceil(ST_XMax(_area) / _cell),
+            ceil(ST_YMax(_area) / _cell),
+            ST_SRID(_area)
+        );
+
+        SELECT
+            obstacles INTO _obstacles
+        FROM
+            obstacle_cache
+        WHERE
+            block_key = _block_key
+        AND
+            draft = _draft
+        AND
+            chart = _chart
+        AND
+            version = _version;
+
+        IF NOT FOUND THEN
+            SELECT
+                coalesce(array_agg(ST_Intersection(obstacles.geom::geometry, _block)), '{}')
+                INTO _obstacles
             FROM (
-                SELECT 
-                    geom, chart.scale
-                FROM 
-                    coalne, chart 
-                WHERE 
-                    ST_Intersects(
-                        geom,
-                        ST_GeomFromGeoJSON(params->>'area_geom')
-                    )
-                AND 
-                    coalne.name = chart.name
+                SELECT
+                    geom
+                FROM
+                    coalne
+                WHERE
+                    ST_Intersects(geom, _block)
+                AND
+                    coalne.name = _chart
+                UNION
+                SELECT
+                    geom
+                FROM
+                    depcnt
+                WHERE
+                    ST_Intersects(geom, _block)
+                AND
+                    valdco <= _draft
+                AND
+                    depcnt.name = _chart
                 UNION
-                SELECT 
-                    geom, chart.scale
-                FROM 
-                    depcnt, chart
-                WHERE 
-                    ST_Intersects(
-                        geom,
-                        ST_GeomFromGeoJSON(params->>'area_geom')
-                    ) 
-                AND 
-                    valdco <= (params->>'draft')::numeric
-                AND 
-                    depcnt.name = chart.name
-                UNION 
-                SELECT 
-                    geom, chart.scale
-                FROM 
-                    slcons, chart
+                SELECT
+                    geom
+                FROM
+                    slcons
                 WHERE
-                    ST_Intersects(
-                        geom,
-                        ST_GeomFromGeoJSON(params->>'area_geom')
-                    )   
-                AND 
-                    slcons.name = chart.name
-            ) AS obstacles
-        )
+                    ST_Intersects(geom, _block)
+                AND
+                    slcons.name = _chart
+            ) AS obstacles;
+
+            -- PostgREST runs GET requests in read-only transactions, which
+            -- answer from the cache but leave misses to POST requests
+            IF NOT current_setting('transaction_read_only')::boolean THEN
+                INSERT INTO obstacle_cache (block_key, draft, chart, version, obstacles)
+                    VALUES (_block_key, _draft, _chart, _version, _obstacles)
+                    ON CONFLICT DO NOTHING;
+
+                -- Expire the cache every 15 minutes from the first miss that
+                -- finds it due, so that it stays bounded without pg_cron. A
+                -- concurrent miss skips the expiry rather than wait for it.
+                PERFORM FROM obstacle_cache_expiry
+                    WHERE expired < now() - interval '15 minutes'
+                    FOR UPDATE SKIP LOCKED;
+                IF FOUND THEN
+                    UPDATE obstacle_cache_expiry SET expired = now();
+                    PERFORM expire_obstacle_cache();
+                END IF;
+            END IF;
+        END IF;
+
+        RETURN (
+            SELECT
+                (ST_AsGeoJSON(t.*)::json)
+            FROM (
+                VALUES (
+                    (
+                        SELECT
+                            ST_Collect(ST_Intersection(obstacle, _area))
+                        FROM
+                            unnest(_obstacles) AS obstacle
+                        WHERE
+                            ST_Intersects(obstacle, _area)
+                    )
+                )
+            ) AS t(geom)
+        );
     END
 $_$;
+
+-- Delete the cache entries of outdated chart data and of areas no longer looked
+-- at. Called by get_obstacles on cache misses at most every 15 minutes, and
+-- also scheduled with pg_cron where that extension is installed, which the
+-- postgis image used by docker-compose.gis-database.yml does not include.
+CREATE OR REPLACE FUNCTION public.expire_obstacle_cache() RETURNS bigint
+    LANGUAGE sql
+    SET search_path = public, pg_temp
+    AS $_$
+    WITH deleted AS (
+        DELETE FROM
+            obstacle_cache
+        WHERE
+            version < (SELECT version FROM chart_version)
+        OR
+            created < now() - interval '1 day'
+        RETURNING 1
+    )
+    SELECT count(*) FROM deleted;
+$_$;
+REVOKE EXECUTE ON FUNCTION public.expire_obstacle_cache() FROM PUBLIC, web_anon;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule(
+            'expire-obstacle-cache', '*/15 * * * *', 'SELECT public.expire_obstacle_cache()'
+        );
+    ELSE
+        RAISE WARNING 'pg_cron is not installed, the obstacle cache is only expired '
+            'by cache misses of POST /rpc/get_obstacles, or by running '
+            'SELECT public.expire_obstacle_cache(); periodically';
+    END IF;
+END
+$$;
+
+-- The chart tables read by get_obstacles
+CREATE OR REPLACE FUNCTION public.chart_tables() RETURNS text[]
+    LANGUAGE sql
+    IMMUTABLE
+    AS $_$
+    SELECT ARRAY['m_covr', 'coalne', 'depcnt', 'slcons'];
+$_$;
+
+-- Increment the version of the chart data whenever chart data is changed
+CREATE OR REPLACE FUNCTION public.increment_chart_version() RETURNS trigger
+    LANGUAGE plpgsql
+    SECURITY DEFINER
+    SET search_path = public, pg_temp
+    AS $_$
+    BEGIN
+        UPDATE chart_version SET version = version + 1;
+        RETURN NULL;
+    END
+$_$;
+
+-- Attach the increment_chart_version trigger to the chart tables that exist
+-- and lack it, and increment the version if there are any
+CREATE OR REPLACE FUNCTION public.attach_chart_triggers() RETURNS void
+    LANGUAGE plpgsql
+    SET search_path = public, pg_temp
+    AS $_$
+    DECLARE
+        chart_table text;
+        attached boolean := false;
+    BEGIN
+        FOREACH chart_table IN ARRAY chart_tables() LOOP
+            IF to_regclass('public.' || quote_ident(chart_table)) IS NOT NULL
+            AND NOT EXISTS (
+                SELECT FROM pg_trigger
+                WHERE tgrelid = to_regclass('public.' || quote_ident(chart_table))
+                AND tgname = 'increment_chart_version'
+            ) THEN
+                EXECUTE format(
+                    'CREATE TRIGGER increment_chart_version '
+                    'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.%I '
+                    'FOR EACH STATEMENT EXECUTE FUNCTION public.increment_chart_version()',
+                    chart_table
+                );
+                attached := true;
+            END IF;
+        END LOOP;
+
+        IF attached THEN
+            UPDATE chart_version SET version = version + 1;
+        END IF;
+    END
+$_$;
+REVOKE EXECUTE ON FUNCTION public.attach_chart_triggers() FROM PUBLIC, web_anon;
+
+-- Chart tables recreated by a load of chart data get their trigger, and
+-- dropping one increments the version, so that the cache follows any load
+-- without running this script again
+CREATE OR REPLACE FUNCTION public.watch_chart_tables() RETURNS event_trigger
+    LANGUAGE plpgsql
+    SET search_path = public, pg_temp
+    AS $_$
+    BEGIN
+        IF TG_EVENT = 'sql_drop' THEN
+            IF EXISTS (
+                SELECT FROM pg_event_trigger_dropped_objects()
+                WHERE object_type = 'table'
+                AND schema_name = 'public'
+                AND object_name = ANY (chart_tables())
+            ) THEN
+                UPDATE chart_version SET version = version + 1;
+            END IF;
+        ELSIF EXISTS (
+            SELECT FROM pg_event_trigger_ddl_commands()
+            WHERE object_type = 'table'
+            AND schema_name = 'public'
+            AND objid IN (
+                SELECT to_regclass('public.' || quote_ident(name))
+                FROM unnest(chart_tables()) AS name
+            )
+        ) THEN
+            PERFORM attach_chart_triggers();
+        END IF;
+    END
+$_$;
+
+-- Event triggers can only be created by a superuser, such as the
+-- POSTGRES_USER of the gis-database container
+DROP EVENT TRIGGER IF EXISTS watch_chart_tables_created;
+CREATE EVENT TRIGGER watch_chart_tables_created ON ddl_command_end
+    WHEN TAG IN ('CREATE TABLE', 'CREATE TABLE AS', 'SELECT INTO', 'ALTER TABLE')
+    EXECUTE FUNCTION public.watch_chart_tables();
+DROP EVENT TRIGGER IF EXISTS watch_chart_tables_dropped;
+CREATE EVENT TRIGGER watch_chart_tables_dropped ON sql_drop
+    WHEN TAG IN ('DROP TABLE')
+    EXECUTE FUNCTION public.watch_chart_tables();
+
+-- Replace the triggers of earlier versions of this script, which cleared the
+-- cache on every change of chart data
+DROP FUNCTION IF EXISTS public.invalidate_obstacle_cache() CASCADE;
+
+SELECT public.attach_chart_triggers();